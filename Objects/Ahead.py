@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+import multiprocessing as mp
+import queue
+import numpy as np
+from Objects import Checkpoint
+from Objects.Profiler import PROFILER
+
+# the process is forked, so that it inherits the world without pickling it;
+# where it's not possible (e.g. on Windows) the days are simulated in series
+FORK = "fork" in mp.get_all_start_methods()
+
+
+class Ahead:
+    """Simulates the days of a World in advance in a forked process, while the
+    figure is still showing the previous ones. The process puts in a buffer of
+    at most size days what the history keeps of each day (status and number
+    of animals), together with the state of the world and of the random
+    generator at its end (see Objects.Checkpoint.state).
+
+    Taking a day (see take) only appends it to the history of the world, the
+    animals and the cells of the main process are left as they were: sync
+    brings them to the last day taken, and it has to be called before they
+    are read or changed (e.g. by a bomb). sync also stops the process, so the
+    days simulated in advance are thrown away, and the next take forks a new
+    one from the changed world"""
+    def __init__(self, world, size=16):
+        self.world = world
+        self.size = size
+        self.process = None
+        self.days = None  # the buffer
+        self.stop = None
+        self.next = None  # day the process is going to put next
+        self.pending = None  # state and random state of the last day taken
+
+    def __repr__(self):
+        return f"Ahead({self.world}, {self.size} days)"
+
+    def usable(self):
+        """The days simulated in advance skip the sinks and the profiler, and
+        the paths of the tracked groups would not be updated"""
+        return FORK and not (self.world.sinks or self.world.tracked or
+                             PROFILER.enabled)
+
+    def start(self, frame):
+        """Forks the process simulating the days from frame on"""
+        ctx = mp.get_context("fork")
+        self.days = ctx.Queue(self.size)
+        self.stop = ctx.Event()
+        self.process = ctx.Process(target=produce, daemon=True,
+                                   args=(self.world, frame, self.days,
+                                         self.stop))
+        self.process.start()
+        self.next = frame
+
+    def take(self, frame):
+        """Returns the status and the number of (erbasts, carvizes) of the day
+        frame, the one after the last of the history"""
+        if self.process is None or self.next != frame:
+            self.sync()
+            self.start(frame)
+        while True:
+            try:
+                day = self.days.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    self.cancel()
+                    raise RuntimeError("The process simulating ahead died")
+        if isinstance(day, Exception):
+            self.cancel()
+            raise day
+        _, status, counts, state, rng = day
+        self.pending = state, rng
+        self.next += 1
+        return status, counts
+
+    def cancel(self):
+        """Stops the process, forgetting the days in the buffer"""
+        if self.process is None:
+            return
+        self.stop.set()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.days.close()
+        self.process = self.days = self.stop = self.next = None
+
+    def sync(self):
+        """Stops the process and puts the world in the state of the last day
+        taken"""
+        self.cancel()
+        if self.pending is not None:
+            state, rng = self.pending
+            self.pending = None
+            Checkpoint.restore(self.world, state)
+            np.random.set_state(rng)
+
+
+def produce(world, frame, days, stop):
+    """Body of the process of Ahead: simulates the days from frame on, until
+    stop is set"""
+    # the items still in the pipe are dropped when the process is stopped
+    days.cancel_join_thread()
+    world.ahead = None
+    try:
+        while not stop.is_set():
+            status, counts = world.simulate(frame)
+            day = (frame, status, counts, Checkpoint.state(world),
+                   np.random.get_state())
+            while not stop.is_set():
+                try:
+                    days.put(day, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            frame += 1
+    except Exception as e:
+        days.put(e)
@@ -2,6 +2,9 @@
 from numpy.random import randint as rand
 
 ecosystem = None
+# graveyards shared by all the animals dead in the same cell for the same
+# reason, see Graveyard.get
+GRAVEYARDS = {}
 
 class Cell:
     """Class representing a cell in the world
@@ -23,13 +26,14 @@ class Cell:
         ecosystem = __import__("Objects.Ecosystem").Ecosystem
         return ecosystem
 
-    def spawn_vegetob(self, density: float):
-        """Spawns a vegetob in the cell"""
+    def spawn_vegetob(self, density: float, world):
+        """Spawns a vegetob in the cell, its density is stored in the
+        vegetation array of the world"""
         assert self.vegetob is None, f"{self} already has a vegetob"
         assert not self.water, f"Can't spawn vegetob in water at {self}"
         # obj = __import__("Objects.Ecosystem")
         # self.Ecosystem = obj.Ecosystem
-        self.vegetob = self.Ecosystem.Vegetob(density, self)
+        self.vegetob = self.Ecosystem.Vegetob(density, self, world)
 
     def add_herd(self, herd, world=None):
         """The world argument is only used when spawning a new herd when
@@ -38,7 +42,11 @@ class Cell:
             erbasts = []
             for _ in range(rand(0, 4)):
                 erbasts.append(self.Ecosystem.Erbast.spawn(self, world))
-            self.herd = self.Ecosystem.Herd(erbasts, self, world)
+            if not erbasts:
+                return
+            # the constructor puts the herd in the cell, joining the one that
+            # may already be there (e.g. when reviving)
+            self.Ecosystem.Herd(erbasts, self, world)
             for erbast in self.herd.members:
                 erbast.herd = self.herd
         elif self.herd:
@@ -55,7 +63,8 @@ class Cell:
             carvizes = []
             if rand(5) == 1:
                 carvizes.append(self.Ecosystem.Carviz.spawn(self, world))
-                self.pride = self.Ecosystem.Pride(carvizes, self, world)
+                # as in add_herd, the pride already there is joined or fought
+                self.Ecosystem.Pride(carvizes, self, world)
                 for carviz in self.pride.members:
                     carviz.pride = self.pride
         elif self.pride:
@@ -96,6 +105,15 @@ class Graveyard(Cell):
         self.vegetob = DeadVegetob(self)
         self.reason_of_death = reason
 
+    @classmethod
+    def get(cls, x: int, y: int, reason: str):
+        """Graveyard of the cell (x, y) for reason, allocated only the first
+        time an animal dies there for that reason"""
+        key = (x, y, reason)
+        if key not in GRAVEYARDS:
+            GRAVEYARDS[key] = cls(x, y, reason)
+        return GRAVEYARDS[key]
+
     def __repr__(self):
         return f"Graveyard({self.x}, {self.y})"
 
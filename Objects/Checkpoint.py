@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+import atexit
+import json
+import os
+import queue
+import threading
+import numpy as np
+from Objects.Cell import Graveyard
+from Objects.Ecosystem import Group, Erbast, Carviz, Herd, Pride
+from Objects.History import SCALE
+from Objects.Store import COLUMNS
+from Objects.Trajectory import Trajectory
+from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH, ERBAST_STORE, \
+    CARVIZ_STORE
+
+# bumped every time the layout of the arrays changes
+VERSION = 1
+SPECIES = (("erbast", ERBASTS, ERBAST_STORE, Erbast, Herd),
+           ("carviz", CARVIZES, CARVIZ_STORE, Carviz, Pride))
+
+
+def state(world):
+    """Returns the whole state of the world as a dictionary of flat arrays:
+    vegetation, water, the columns of the stores, the members of each group
+    (concatenated, with the offset of each group), their memory and tracked
+    positions, and the number of animals of each past day. The arrays are
+    copies, so the simulation can go on while they are written"""
+    n = world.num_cells
+    history = world.history
+    result = {"version": np.array(VERSION), "num_cells": np.array(n),
+              "vegetation": world.vegetation.copy(),
+              "water": world.water.copy(),
+              "counts": history.counts.copy(),
+              # a history without images (see History) leaves it black
+              "status": np.array(history.frames[len(history)-1])
+              if history.images else np.zeros((n, n, 3), dtype=np.uint8),
+              "causes": np.array(json.dumps(CAUSE_OF_DEATH))}
+    for name, animals, store, _, cls in SPECIES:
+        size = store.size
+        for column in COLUMNS:
+            result[f"{name}_{column}"] = getattr(store, column)[:size].copy()
+        result[f"{name}_free"] = np.array(store.free, dtype=np.int64)
+        result[f"{name}_pending"] = np.array(store.pending, dtype=np.int64)
+        result[f"{name}_reasons"] = np.array(
+            [animals[i].pos.reason_of_death or "" for i in
+             np.flatnonzero(~store.alive[:size]).tolist()], dtype=str)
+
+        attribute = cls.member_attribute
+        groups = {}
+        for i in np.flatnonzero(store.alive[:size]).tolist():
+            group = getattr(animals[i], attribute)
+            if i in group.members_id and \
+                    getattr(group.pos, attribute) is group:
+                groups[id(group)] = group
+        groups = list(groups.values())
+        members = [list(group.members_id) for group in groups]
+        memory = [(g, c.x*n + c.y, v) for g, group in enumerate(groups)
+                  for c, v in group.memory.items()]
+        tracked = [(g, d, x*n + y) for g, group in enumerate(groups)
+                   if group.tracked is not None
+                   for d, x, y in group.tracked]
+        result[f"{name}_group_cell"] = np.array(
+            [group.pos.x*n + group.pos.y for group in groups], dtype=np.int64)
+        result[f"{name}_group_offsets"] = np.cumsum(
+            [0] + [len(m) for m in members], dtype=np.int64)
+        result[f"{name}_group_members"] = np.array(
+            [i for m in members for i in m], dtype=np.int64)
+        result[f"{name}_memory"] = np.array(memory,
+                                            dtype=np.float64).reshape(-1, 3)
+        result[f"{name}_tracked"] = np.array(tracked,
+                                             dtype=np.int64).reshape(-1, 3)
+    return result
+
+
+def restore(world, state):
+    """Puts the world back in the given state (see state). The days of the
+    history after the one of the checkpoint are forgotten; the images of the
+    days that are missing from the history of the world (if the state comes
+    from another one) are replaced by the image of the checkpoint"""
+    if int(state["version"]) != VERSION:
+        raise ValueError(f"Checkpoint version {int(state['version'])} is not \
+supported, expected {VERSION}")
+    n = world.num_cells
+    if int(state["num_cells"]) != n:
+        raise ValueError(f"Checkpoint of a world of {int(state['num_cells'])} \
+cells, while this world has {n}")
+    grid = world.grid
+    index, ERBAST_STORE.index = ERBAST_STORE.index, None
+    world.tracked.clear()
+
+    water = state["water"]
+    for x, y in np.argwhere(water != world.water).tolist():
+        cell = grid[x, y]
+        world.set_water(cell, water[x, y])
+        cell.vegetob = None
+        if not water[x, y]:
+            cell.spawn_vegetob(0, world)
+    world.vegetation[:] = state["vegetation"]
+    for cell in grid.flat:
+        cell.herd = None
+        cell.pride = None
+
+    counts = state["counts"]
+    history = world.history
+    history.truncate(len(counts))
+    status = state["status"].astype(np.float32) / SCALE
+    for frame in range(len(history), len(counts)):
+        history.append((status, counts[frame]))
+
+    causes = json.loads(str(state["causes"]))
+    for name in CAUSE_OF_DEATH:
+        CAUSE_OF_DEATH[name].clear()
+        CAUSE_OF_DEATH[name].update(causes[name])
+
+    for name, animals, store, kind, cls in SPECIES:
+        size = len(state[f"{name}_alive"])
+        store.clear()
+        store.reserve(size)
+        for column in COLUMNS:
+            getattr(store, column)[:size] = state[f"{name}_{column}"]
+        store.size = size
+        store.free = state[f"{name}_free"].tolist()
+        store.pending = state[f"{name}_pending"].tolist()
+        store.recount()
+
+        alive = store.alive[:size]
+        cells = store.cell[:size].tolist()
+        reasons = iter(state[f"{name}_reasons"].tolist())
+        animals.clear()
+        for i in range(size):
+            animal = kind.__new__(kind)
+            animal._id = i
+            animal.world = world
+            x, y = divmod(cells[i], n)
+            animal._pos = grid[x, y] if alive[i] else \
+                Graveyard.get(x, y, next(reasons) or None)
+            animals.append(animal)
+
+        attribute = cls.member_attribute
+        offsets = state[f"{name}_group_offsets"].tolist()
+        members = state[f"{name}_group_members"].tolist()
+        groups = []
+        for g, c in enumerate(state[f"{name}_group_cell"].tolist()):
+            cell = grid.flat[c]
+            # the constructor of the groups would also put them in the cell
+            group = cls.__new__(cls)
+            Group.__init__(group, cell, world,
+                           [animals[i] for i in members[offsets[g]:
+                                                        offsets[g+1]]])
+            for member in group.members:
+                setattr(member, attribute, group)
+            setattr(cell, attribute, group)
+            groups.append(group)
+        for g, c, v in state[f"{name}_memory"].tolist():
+            groups[int(g)].memory[grid.flat[int(c)]] = v
+        trajectories = {}
+        for g, d, c in state[f"{name}_tracked"].tolist():
+            trajectories.setdefault(g, []).append((d, *divmod(c, n)))
+        for g, positions in trajectories.items():
+            groups[g].tracked = Trajectory(positions)
+            world.tracked[groups[g].gid] = groups[g]
+        # animals that are in no group (e.g. left their herd without the
+        # energy to reach a new cell) point to an empty one, like they did
+        nowhere = cls.__new__(cls)
+        Group.__init__(nowhere, grid[0, 0], world, [])
+        for animal in animals:
+            if not hasattr(animal, attribute):
+                setattr(animal, attribute, nowhere)
+
+    ERBAST_STORE.index = index
+    index.rebuild(ERBAST_STORE)
+
+
+def write(path, state):
+    """Writes a state (see state) in the .npz file path. The file is renamed
+    only once complete, so a checkpoint is never left half written"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **state)
+    os.replace(tmp, path)
+
+
+def save(path, world):
+    """Writes the state of the world in the .npz file path"""
+    write(path, state(world))
+
+
+def load(path, world):
+    """Restores the world from the .npz file path, written by save"""
+    with np.load(path) as data:
+        restore(world, dict(data))
+
+
+class Checkpointer:
+    """Saves checkpoints without stopping the simulation: the state of the
+    world is copied right away (see state), then it is written by a
+    background thread while the simulation goes on. Only the last keep
+    checkpoints written are kept on disk, the older ones are deleted, those
+    left in directory by the previous runs included"""
+    def __init__(self, keep=10, directory="checkpoints"):
+        self.keep = keep
+        # paths of the checkpoints on disk, oldest first
+        self.written = on_disk(directory)
+        self.queue = queue.Queue()
+        self.thread = None
+        self.error = None
+
+    def __repr__(self):
+        return f"Checkpointer({len(self.written)} on disk, \
+{self.queue.unfinished_tasks} pending)"
+
+    def submit(self, path, world):
+        """Takes a snapshot of world, to be written in path"""
+        self.check()
+        snapshot = state(world)
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+        self.queue.put((path, snapshot))
+
+    def work(self):
+        while True:
+            path, snapshot = self.queue.get()
+            try:
+                write(path, snapshot)
+                if path in self.written:
+                    self.written.remove(path)
+                self.written.append(path)
+                while len(self.written) > self.keep:
+                    os.remove(self.written.pop(0))
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """Waits until all the submitted checkpoints are on disk"""
+        self.queue.join()
+        self.check()
+
+    def check(self):
+        """Raises the error of the last failed write, if any"""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+def on_disk(directory):
+    """Returns the paths of the checkpoints in directory, written as World.day
+    and Simulation do (checkpoint_DAY.npz), sorted by day"""
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for name in os.listdir(directory):
+        day = name.removeprefix("checkpoint_").removesuffix(".npz")
+        if name != day and day.isdigit():
+            days.append(int(day))
+    return [f"{directory}/checkpoint_{day}.npz" for day in sorted(days)]
+
+
+# used by World.day and Simulation, pending checkpoints are written before
+# exiting
+CHECKPOINTER = Checkpointer()
+atexit.register(CHECKPOINTER.wait)
@@ -1,9 +1,12 @@
 #!/usr/bin/env python
+from itertools import count
 import numpy as np
 from Objects.Cell import Cell, Graveyard
+from Objects.Trajectory import Trajectory
 from Objects.World import World
 from errors import AlreadyDeadError
-from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH
+from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH, ERBAST_STORE, \
+    CARVIZ_STORE, PARAMETERS
 
 
 def part(n: float, m: int):
@@ -18,54 +21,91 @@ def part(n: float, m: int):
 
 
 class Vegetob:
-    """Class representing a vegetob, vegetation object"""
-    def __init__(self, density: float, position):
+    """Class representing a vegetob, vegetation object. The density is not
+    stored in the object: it is a view on the vegetation array of the world, so
+    that growth can happen for all the cells at once (see
+    World.grow_vegetation)"""
+    def __init__(self, density: float, position, world: World):
         assert 0 <= density <= 100, "Not a valid density"
-        self.density = density
         self.position = position
+        self.world = world
+        self.density = density
 
-    def grow(self):
-        # density growing according to a weird function I made up. It grows
-        # faster when density is low but not extremely low and approaches the
-        # limit of 100
-        if self.density < 1:
-            self.density = 1
-        else:
-            # even logistic curve, resulted in the death of Erbasts
-            # self.density += self.density * (100 - self.density) / 10000
-            self.density += self.density * (100 - self.density)**2 / 100000
+    @property
+    def density(self):
+        return float(self.world.vegetation[self.position.x, self.position.y])
+
+    @density.setter
+    def density(self, value):
+        self.world.vegetation[self.position.x, self.position.y] = value
 
     def suppress(self):
         self.density = 0
 
 
 class Animal:
-    """Parent class of both Carviz and Erbast"""
+    """Parent class of both Carviz and Erbast. The attributes of the animal are
+    stored in the row self.id of the AnimalStore of its species (self.store)"""
+    store = None  # defined in subclasses
+
     def __init__(self, energy: int, lifetime: int, social_attitude: float,
                  position: Cell, world: World):
         assert energy >= 0, "Animal was born dead"
         assert lifetime >= 0, "Animal should have already died"
         assert 0 <= social_attitude <= 1, "Social Attitude not valid"
-        self.energy = energy
-        self.lifetime = lifetime
-        self.social_attitude = social_attitude
-        self.age = 0
-        self.pos = position
+        self._id = self.store.allocate(energy, lifetime, social_attitude)
         self.world = world
-        self._alive = True
+        self.pos = position
+
+    @property
+    def energy(self):
+        return self.store.energy[self._id]
+
+    @energy.setter
+    def energy(self, value):
+        self.store.set_energy(self._id, value)
+
+    @property
+    def lifetime(self):
+        return self.store.lifetime[self._id]
+
+    @lifetime.setter
+    def lifetime(self, value):
+        self.store.lifetime[self._id] = value
+
+    @property
+    def age(self):
+        return self.store.age[self._id]
+
+    @age.setter
+    def age(self, value):
+        self.store.age[self._id] = value
+
+    @property
+    def social_attitude(self):
+        return self.store.social_attitude[self._id]
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, cell):
+        self._pos = cell
+        self.store.move(self._id, cell.x*self.world.num_cells + cell.y)
 
     @property
     def alive(self):
-        return self._alive
+        return self.store.alive[self._id]
 
     def __repr__(self):
-        return f"{self.__class__.__name__}({self.pos}, {self.id}, {self._alive})"
+        return f"{self.__class__.__name__}({self.pos}, {self.id}, {self.alive})"
 
     def grow(self, population=0):
-        # not to be confused with the grow method of Vegetob, this is just
+        # not to be confused with the growth of Vegetobs, this is just
         # changing the age of individual and checking if it's dead. This
         # function is called at the beginning of every turn and for convenience
-        # has the same name as the grow method of Vegetob
+        # has the same name as World.grow_vegetation
 
         self.age += 1
         # while self.energy >= 150:
@@ -91,31 +131,22 @@ class Animal:
 
 class Erbast(Animal):
     """Class representing an Erbast, a herbivore"""
+    store = ERBAST_STORE
+
     def __init__(self, energy: int, lifetime: int,
                  social_attitude: float, position: Cell, herd, world: World):
         global ERBASTS
         super().__init__(energy, lifetime, social_attitude, position, world)
         self.herd = herd
-        self._id = len(ERBASTS)
-        ERBASTS.append(self)
+        if self._id < len(ERBASTS):
+            ERBASTS[self._id] = self
+        else:
+            ERBASTS.append(self)
 
     @property
     def id(self):
         return self._id
 
-    @id.setter
-    def id(self, value):
-        try:
-            self.herd.remove(self)
-        except ValueError:
-            print("\n\nError in Erbast.id.setter")
-            print(self._id, end = " not in ")
-            print(self.herd.members_id)
-            print(self, self.herd, self.pos.herd)
-            raise ValueError
-        self._id = value
-        self.herd.add(self)
-
     def graze(self, quantity):
         self.energy += quantity // (self.age+1) * self.lifetime
 
@@ -128,7 +159,7 @@ class Erbast(Animal):
 
     def quit_herd(self):
         self.herd.remove(self)
-        if not self._alive:
+        if not self.alive:
             return
         if self.energy > self.pos.vegetob.density:
             destination = np.random.choice(self.world.get_neighbors(self.pos,
@@ -142,8 +173,10 @@ class Erbast(Animal):
             self.herd = self.pos.herd
             self.herd.add(self)
         else:
+            # the part of a tracked herd that splits is tracked as well
+            tracked = self.herd.tracked
             self.herd = Herd([self], self.pos, self.world,
-                             list(self.herd.tracked))
+                             None if tracked is None else tracked.copy())
             self.pos.add_herd(self.herd)
 
     def choose_erbast(self, new_herd_pos):
@@ -158,21 +191,22 @@ class Erbast(Animal):
 
     @classmethod
     def spawn(cls, pos: Cell, wrld):
-        return cls(100, 10, 0.8, pos, pos.herd, wrld)
+        return cls(PARAMETERS["erbast_energy"], PARAMETERS["erbast_lifetime"],
+                   PARAMETERS["erbast_social_attitude"], pos, pos.herd, wrld)
 
     def die(self, reason=None):
         global CAUSE_OF_DEATH
-        if not self._alive:
+        if not self.alive:
             raise AlreadyDeadError(f"{self} is already dead by \
 {self.pos.reason_of_death}, and now {reason}")
-        self._alive = False
+        self.store.release(self._id, reason)
         try:
             CAUSE_OF_DEATH["Erbast"][reason] += 1
         except KeyError:
             CAUSE_OF_DEATH["Erbast"][reason] = 1
-        self.herd.remove(self)
         # this partitions randomly the energy and lifetime of the ancestor to
-        # the children
+        # the children. They join the herd before the ancestor leaves it, so
+        # that it is not removed from its cell for being empty
         if self.energy > 5 and reason not in ["overcrowding", "hunted_down",
                                               "bomb"]:
             for E, L in zip(part(self.energy, 2), part(self.lifetime*2, 2)):
@@ -181,39 +215,30 @@ class Erbast(Animal):
                     self.herd.add(Erbast(E, L, s_a, self.herd.pos, self.herd, self.world))
                 except Exception as e:
                     print(e)
+        self.herd.remove(self)
 
-        self.pos = Graveyard(self.pos.x, self.pos.y, reason)
+        self.pos = Graveyard.get(self.pos.x, self.pos.y, reason)
         del self
 
 
 class Carviz(Animal):
     """Class representing a Carviz, """
+    store = CARVIZ_STORE
+
     def __init__(self, energy: int, lifetime: int,
                  social_attitude: float, position: Cell, pride, world: World):
         global CARVIZES
         super().__init__(energy, lifetime, social_attitude, position, world)
         self.pride = pride
-        self._id = len(CARVIZES)
-        CARVIZES.append(self)
+        if self._id < len(CARVIZES):
+            CARVIZES[self._id] = self
+        else:
+            CARVIZES.append(self)
 
     @property
     def id(self):
         return self._id
 
-    @id.setter
-    def id(self, value):
-        try:
-            self.pride.remove(self)
-        except ValueError:
-            print("\n\nError in Carviz.id.setter")
-            print(self._id, end = " not in ")
-            print(self.pride.members_id)
-            print(self, self.pride, self.pos.pride)
-            raise ValueError
-
-        self._id = value
-        self.pride.add(self)
-
     def stay_with_pride(self, new_pride_pos):
         self.energy -= self.world.distance(self.pos, new_pride_pos)
         if self.energy <= 0:
@@ -223,7 +248,7 @@ class Carviz(Animal):
 
     def quit_pride(self):
         self.pride.remove(self)
-        if not self._alive:
+        if not self.alive:
             return
         if not self.pos.herd or self.energy > self.pos.herd.get_energy():
             destination = np.random.choice(self.world.get_neighbors(self.pos,
@@ -237,40 +262,40 @@ class Carviz(Animal):
             self.pride = self.pos.pride
             self.pride.add(self)
         else:
+            tracked = self.pride.tracked
             self.pride = Pride([self], self.pos, self.world,
-                               list(self.pride.tracked))
+                               None if tracked is None else tracked.copy())
             self.pos.add_pride(self.pride)
 
     def choose_carviz(self, new_pride_pos):
         """choice of the single carviz to stay or leave the pride"""
-        if np.random.random() < 0.5:
+        if np.random.random() < PARAMETERS["carviz_stay"]:
             self.stay_with_pride(new_pride_pos)
         else:
             self.quit_pride()
 
     @classmethod
     def spawn(cls, pos: Cell, wrld):
-        return cls(1000, 1, 0.8, pos, pos.pride, wrld)
+        return cls(PARAMETERS["carviz_energy"], PARAMETERS["carviz_lifetime"],
+                   PARAMETERS["carviz_social_attitude"], pos, pos.pride, wrld)
 
     def die(self, reason=None):
         global CAUSE_OF_DEATH
-        if not self._alive:
+        if not self.alive:
             inpride = []
             for row in self.world.grid:
                 for cell in row:
-                    if cell.pride and self in cell.pride.members:
+                    if cell.pride and self in cell.pride:
                         inpride.append(cell.pride)
             raise AlreadyDeadError(f"{self} is already dead by \
 {self.pos.reason_of_death}, and now {reason}\n\nself was in prides: \
 {inpride}\n and its pride is {self.pride} or {self.pos.pride if self.pos.pride else None}")
-        self._alive = False
+        self.store.release(self._id, reason)
         try:
             CAUSE_OF_DEATH["Carviz"][reason] += 1
         except KeyError:
             CAUSE_OF_DEATH["Carviz"][reason] = 1
-        self.pride.remove(self)
-        # this partitions randomly the energy and lifetime of the ancestor to
-        # the children
+        # as for the erbasts, the children join before the ancestor leaves
         if self.energy > 5 and reason not in ["overcrowding", "fight", "bomb"]:
             number = 2
             for E, L in zip(part(self.energy, number),
@@ -280,89 +305,121 @@ class Carviz(Animal):
                     self.pride.add(Carviz(E, L, s_a, self.pride.pos, self.pride, self.world))
                 except Exception as e:
                     print(e)
+        self.pride.remove(self)
 
-        self.pos = Graveyard(self.pos.x, self.pos.y, reason)
+        self.pos = Graveyard.get(self.pos.x, self.pos.y, reason)
         del self
 
 
 class Group:
     """Class representing a group of Animals, parent of herd and Pride"""
+    gids = count()  # generator of unique group ids, see AnimalStore.group
+    store = None  # AnimalStore of the members, defined in subclasses
+    member_attribute = None  # attribute of the members pointing to the group
+
     def __init__(self, pos: Cell, world: World, members: Carviz or Erbast,
-                 tracked=[]):
+                 tracked=None):
         self.pos = pos
         self.world = world
-        self.members_id = [m.id for m in members]
+        self.gid = next(Group.gids)
+        # used as an ordered set: constant time add, remove and membership
+        self.members_id = dict.fromkeys(m.id for m in members)
+        self.store.group[self.ids()] = self.gid
         self.memory = {}
+        # Trajectory of the group if it is tracked, None otherwise
         self.tracked = tracked
+        if tracked is not None:
+            world.tracked[self.gid] = self
 
     def __repr__(self):
-        return f"{self.__class__.__name__}(({self.pos}), {self.members_id})"
+        return f"{self.__class__.__name__}(({self.pos}), {list(self.members_id)})"
 
     def __eq__(self, other):
+        # an animal is in a single group, so two different groups can't share
+        # members and the check almost always stops at the first one
+        if self is other:
+            return True
         if len(self) != len(other):
             return False
-        for member in self.members:
-            if member not in other.members:
-                return False
-        return True
+        return all(m in other.members_id for m in self.members_id)
 
     def __len__(self):
         return len(self.members_id)
 
+    def __contains__(self, member: Carviz or Erbast):
+        return member._id in self.members_id
+
+    def ids(self):
+        """Array of the ids of the members, to index the store"""
+        return np.fromiter(self.members_id, dtype=np.int64, count=len(self))
+
     def add(self, member: Carviz or Erbast):
-        self.members_id.append(member.id)
+        self.members_id[member.id] = None
+        self.store.group[member.id] = self.gid
 
     def remove(self, member: Carviz or Erbast):
-        self.members_id = [m for m in self.members_id if m != member._id]
-        # riskier way to do it
-        # if len(self) == 0:
-        #     if isinstance(self, Herd):
-        #         self.pos.remove_herd()
-        #     elif isinstance(self, Pride):
-        #         self.pos.remove_pride()
-        #     del self
+        self.members_id.pop(member._id, None)
+        if self.store.group[member._id] == self.gid:
+            self.store.group[member._id] = -1
+        # an empty group leaves its cell right away (it could already be
+        # somewhere else, e.g. replaced by the group of an animal that quit)
+        if not self.members_id and \
+                getattr(self.pos, self.member_attribute) is self:
+            setattr(self.pos, self.member_attribute, None)
 
     def join(self, other_group):
-        self.members_id += other_group.members_id
+        # the members must point to the group they are actually in, otherwise
+        # they would not be removed from it when they die, and their id could
+        # be given to a newborn of another group
+        for member in other_group.members:
+            if member.alive:
+                setattr(member, self.member_attribute, self)
+        self.members_id.update(other_group.members_id)
+        self.store.group[other_group.ids()] = self.gid
         for key in other_group.memory:
             if key in self.memory and np.random.random() < 0.5:
                 self.memory[key] = other_group.memory[key]
             else:
                 self.memory[key] = other_group.memory[key]
+        # the group goes on along the path of the tracked one it absorbed
+        if other_group.tracked is not None and self.tracked is None:
+            self.tracked = other_group.tracked
+            self.world.tracked[self.gid] = self
         del other_group
         return self
 
+    def track(self, frame):
+        """Starts following the group from the day frame, its path is shown
+        on the map (see World.draw)"""
+        if self.tracked is None:
+            self.tracked = Trajectory([(frame, self.pos.x, self.pos.y)])
+            self.world.tracked[self.gid] = self
+
     def add_energy(self, energy):
-        for member in self.members:
-            member.energy += 10 * energy/len(self)
+        self.store.add_energy(self.ids(), 10 * energy/len(self))
 
     def get_energy(self):
-        return sum([m.energy for m in self.members])
+        return self.store.energy[self.ids()].sum()
 
     def get_sa(self):
         if len(self) == 0:
             return 1
-        return np.array([m.social_attitude for m in self.members]).mean()
+        return self.store.social_attitude[self.ids()].mean()
 
     def get_lifetime(self):
         if len(self) == 0:
             return 0
-        return np.array([m.lifetime for m in self.members]).mean()
+        return self.store.lifetime[self.ids()].mean()
 
     def get_age(self):
         if len(self) == 0:
             return 0
-        return np.array([m.age for m in self.members]).mean()
-
-    def clean(self, max_id):
-        for member_id in list(self.members_id):
-            if member_id >= max_id:
-                self.members_id.remove(member_id)
+        return self.store.age[self.ids()].mean()
 
     def suppress(self):
         for member in self.members:
             member.die("bomb")
-        self.members_id = [] # should not be necessary but just in case
+        self.members_id = {} # should not be necessary but just in case
 
     @property
     def members(self):
@@ -372,25 +429,29 @@ class Group:
 
 class Herd(Group):
     """Class representing a group of Erbast"""
+    store = ERBAST_STORE
+    member_attribute = "herd"
+
     def __init__(self, erbasts: list[Erbast], position: Cell, world: World,
-                 tracked=[]):
+                 tracked=None):
         super().__init__(position, world, erbasts, tracked)
         self.pos.add_herd(self)
 
     def __getitem__(self, key):
         global ERBASTS
-        return ERBASTS[self.members_id[key]]
+        return ERBASTS[list(self.members_id)[key]]
 
     @property
     def members(self):
         global ERBASTS
-        for member_id in self.members_id:
+        # the ids are copied since members can be removed while iterating
+        for member_id in list(self.members_id):
             yield ERBASTS[member_id]
 
     def get_champion(self):
         global ERBASTS
         return ERBASTS[max(self.members_id, key=lambda m: ERBASTS[m].energy if
-                           ERBASTS[m]._alive else 0, default=0)]
+                           ERBASTS[m].alive else 0, default=0)]
 
     def check_near_cells(self):
         # Can still go to far cells but each time is preferable to stay near, if
@@ -408,24 +469,31 @@ class Herd(Group):
         if self.world.distance(self.pos, new_cell) <= 1:
             self.move(self.pos)
             return
-        neigh = self.world.get_neighbors(self.pos, flag="land")
-        actual_new_cell = neigh[np.argmin([self.world.distance(new_cell, n) for n in neigh])]
+        # the shortest way by land, if there is one nearby
+        actual_new_cell = self.world.paths.step(self.pos, new_cell)
+        if actual_new_cell is None:
+            neigh = self.world.get_neighbors(self.pos, flag="land")
+            actual_new_cell = neigh[np.argmin([self.world.distance(new_cell, n) for n in neigh])]
         self.move(actual_new_cell)
 
     def move(self, new_cell):
         for erbast in list(self.members):
-            if erbast._alive:
+            if erbast.alive:
                 erbast.choose_erbast(new_cell)
             else:
                 self.remove(erbast)
         if new_cell == self.pos:
+            density = self.pos.vegetob.density
             for erbast in self.members:
-                erbast.graze(min(1, self.pos.vegetob.density/len(self)))
-            self.pos.vegetob.density -= min(len(self), self.pos.vegetob.density)
+                erbast.graze(min(1, density/len(self)))
+            self.pos.vegetob.density = density - min(len(self), density)
         else:
-            self.pos.remove_herd()
+            # the herd may have been emptied by the erbasts that quit
+            if self.pos.herd is self:
+                self.pos.remove_herd()
             self.pos = new_cell
-            self.pos.add_herd(self)
+            if len(self):
+                self.pos.add_herd(self)
 
     def choose(self, i):
         self.check_near_cells()
@@ -433,8 +501,8 @@ class Herd(Group):
             self.move_towards(max(self.memory, key=self.memory_value))
         else:
             self.move(self.pos)
-        if self.tracked:
-            self.tracked.append((i, self.pos))
+        if self.tracked is not None:
+            self.tracked.append(i, self.pos.x, self.pos.y)
 
     def grow(self, cell):
         assert cell == self.pos, "Trying to grow in a cell that is not the current one"
@@ -443,7 +511,7 @@ class Herd(Group):
         else:
             population = cell.population()
             for erbast in list(cell.herd.members):
-                if erbast._alive:
+                if erbast.alive:
                     erbast.grow(population)
                 else:
                     cell.herd.remove(erbast)
@@ -454,37 +522,42 @@ class Herd(Group):
 
 
 class Pride(Group):
+    store = CARVIZ_STORE
+    member_attribute = "pride"
+
     def __init__(self, carvizes: list[Carviz], position: Cell, world: World,
-                 tracked=[]):
+                 tracked=None):
         super().__init__(position, world, carvizes, tracked)
         self.pos.add_pride(self)
 
     def __getitem__(self, key):
         global CARVIZES
-        return CARVIZES[self.members_id[key]]
+        return CARVIZES[list(self.members_id)[key]]
 
     @property
     def members(self):
         global CARVIZES
-        for member_id in self.members_id:
+        # the ids are copied since members can be removed while iterating
+        for member_id in list(self.members_id):
             yield CARVIZES[member_id]
 
     def get_champion(self):
         global CARVIZES
         try:
             return CARVIZES[max(self.members_id, key=lambda m: CARVIZES[m].energy if
-                            CARVIZES[m]._alive else 0, default=0)]
+                            CARVIZES[m].alive else 0, default=0)]
         except IndexError:
             for member_id in self.members_id:
-                print(member_id, CARVIZES[member_id]._alive)
+                print(member_id, CARVIZES[member_id].alive)
 
     def check_near_cells(self):
         self.memory = {c: e/2 for c, e in self.memory.items() if e > 0.5}
-        for cell in self.world.get_neighbors(self.pos, self.world.num_cells//10):
-            if cell.herd:
-                self.memory[cell] = cell.herd.get_energy()
-            elif cell in self.memory:
+        near = self.world.num_cells//10
+        targets = self.world.herd_targets(self.pos, near)
+        for cell in self.memory:
+            if cell not in targets and self.world.distance(self.pos, cell) <= near:
                 self.memory[cell] = 0
+        self.memory.update(targets)
 
     def memory_value(self, cell):
         if cell in self.memory: return self.memory[cell]
@@ -494,19 +567,23 @@ class Pride(Group):
         if self.world.distance(self.pos, new_cell) <= 1:
             self.move(self.pos)
             return
-        neigh = self.world.get_neighbors(self.pos, 2, flag="land")
-        actual_new_cell = neigh[np.argmin([self.world.distance(new_cell, n) for n in neigh])]
+        actual_new_cell = self.world.paths.step(self.pos, new_cell, 2)
+        if actual_new_cell is None:
+            neigh = self.world.get_neighbors(self.pos, 2, flag="land")
+            actual_new_cell = neigh[np.argmin([self.world.distance(new_cell, n) for n in neigh])]
         self.move(actual_new_cell)
 
     def move(self, new_cell):
-        self.pos.remove_pride()
+        if self.pos.pride is self:
+            self.pos.remove_pride()
         self.pos = new_cell
-        self.pos.add_pride(self)
+        if len(self):
+            self.pos.add_pride(self)
 
     def choose(self, i):
         def carviz_choices(new_cell):
             for carviz in list(self.members):
-                if carviz._alive:
+                if carviz.alive:
                     carviz.choose_carviz(new_cell)
                 else:
                     self.remove(carviz)
@@ -521,8 +598,8 @@ class Pride(Group):
                            default=np.random.choice(self.world.get_neighbors(self.pos, flag="land")))
             carviz_choices(new_cell)
             self.move_towards(new_cell)
-        if self.tracked:
-            self.tracked.append((i, self.pos))
+        if self.tracked is not None:
+            self.tracked.append(i, self.pos.x, self.pos.y)
 
     def fight(self, other_pride):
         for _ in range(10):
@@ -557,6 +634,9 @@ class Pride(Group):
         return other_pride
 
     def hunt(self):
+        # the herd may have been killed, or the pride emptied, in the meanwhile
+        if not self.pos.herd or not len(self):
+            return
         prey = self.pos.herd.get_champion()
         if prey.energy * np.random.random() < self.get_energy() * np.random.random():
             self.add_energy(prey.energy)
@@ -579,7 +659,7 @@ he got killed also by a different pride)...")
         else:
             population = cell.population()
             for carviz in list(cell.pride.members):
-                if carviz._alive:
+                if carviz.alive:
                     carviz.grow(population)
                 else:
                     cell.pride.remove(carviz)
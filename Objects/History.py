@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+import os
+import tempfile
+import weakref
+import numpy as np
+
+# the statuses are in [0, 1] and are stored as multiples of 1/SCALE: 252 is
+# divisible by 4, so the sizes of the groups (multiples of 1/4) are exact
+SCALE = 252
+
+
+class History:
+    """History of the statuses of the world, one NxNx3 image for each
+    simulated day, together with the number of erbasts and carvizes.
+    The images are quantized to uint8 and kept in a memory-mapped file on
+    disk, so only the days that are actually looked at are loaded in memory,
+    however long the simulation is. It behaves like the list of
+    (status, (num_erbasts, num_carvizes)) it replaces. If images is False
+    only the numbers of animals are kept, and the status of each day is None
+    (e.g. for the headless runs of ensemble.py)"""
+    def __init__(self, num_cells, path=None, capacity=64, images=True):
+        self.num_cells = num_cells
+        self.length = 0
+        self.images = images
+        self._counts = np.zeros((capacity, 2), dtype=np.int64)
+        self.path = path
+        self.frames = None
+        self._file = None
+        if not images:
+            return
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="planisuss_", suffix=".history")
+            self._file = os.fdopen(fd, 'r+b')
+            # the file is mapped through the descriptor, so the temporary one
+            # is removed right away: it is freed when the process exits,
+            # however it exits (e.g. the workers of a pool), where an open
+            # file can't be removed (Windows) together with the history
+            try:
+                os.remove(path)
+                path = None
+            except OSError:
+                weakref.finalize(self, os.remove, path)
+        else:
+            self._file = open(path, 'a+b')
+        self.path = path
+        self._map(capacity)
+
+    def __repr__(self):
+        return f"History({self.num_cells}, {self.length} days)"
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, frame):
+        frame = range(self.length)[frame]  # negative indexes and bounds check
+        status = self.status(frame) if self.images else None
+        return status, tuple(self._counts[frame].tolist())
+
+    def __iter__(self):
+        for frame in range(self.length):
+            yield self[frame]
+
+    def _map(self, capacity):
+        """(Re)maps the file so that it can hold capacity days"""
+        shape = (capacity, self.num_cells, self.num_cells, 3)
+        self._file.truncate(max(int(np.prod(shape)), self.file_size))
+        self.frames = np.memmap(self._file, dtype=np.uint8, mode='r+',
+                                shape=shape)
+
+    @property
+    def capacity(self):
+        return len(self._counts)
+
+    @property
+    def file_size(self):
+        """Bytes of the file of the images on disk"""
+        if self._file is None:
+            return 0
+        return os.fstat(self._file.fileno()).st_size
+
+    @property
+    def counts(self):
+        """(days, 2) array of the number of erbasts and carvizes of each day"""
+        return self._counts[:self.length]
+
+    def status(self, frame):
+        """Image of the world in the given day, as floats in [0, 1]"""
+        return self.frames[frame].astype(np.float32) / SCALE
+
+    def append(self, day):
+        status, counts = day
+        if self.length == self.capacity:
+            if self.images:
+                self.frames.flush()
+                self._map(2*self.capacity)
+            self._counts = np.concatenate((self._counts,
+                                           np.zeros_like(self._counts)))
+        if self.images:
+            self.frames[self.length] = np.rint(np.clip(status, 0, 1)*SCALE)
+        self._counts[self.length] = counts
+        self.length += 1
+
+    def paint(self, frame, x, y, value):
+        """Changes the color of the cell (x, y) in the given day"""
+        self.frames[frame, x, y, :] = round(value*SCALE)
+
+    def truncate(self, length):
+        """Forgets the days from length on"""
+        self.length = min(self.length, length)
+
+    def flush(self):
+        if self.images:
+            self.frames.flush()
+
+    def __getstate__(self):
+        # the pickled history is self-contained, it doesn't refer to the file
+        return {"num_cells": self.num_cells, "length": self.length,
+                "frames": np.array(self.frames[:self.length])
+                if self.images else None,
+                "counts": self.counts.copy()}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_cells"], capacity=max(state["length"], 64),
+                      images=state["frames"] is not None)
+        if self.images:
+            self.frames[:state["length"]] = state["frames"]
+        self._counts[:state["length"]] = state["counts"]
+        self.length = state["length"]
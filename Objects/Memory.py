@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+from functools import lru_cache
+from sys import getsizeof
+import numpy as np
+from Objects.Cell import GRAVEYARDS
+from variables import ERBASTS, CARVIZES, ERBAST_STORE, CARVIZ_STORE
+
+SPECIES = (("erbast", "erbasts", ERBASTS, ERBAST_STORE, "herd"),
+           ("carviz", "carvizes", CARVIZES, CARVIZ_STORE, "pride"))
+
+
+def sizeof(obj):
+    """Bytes of an object together with its attributes dictionary"""
+    return getsizeof(obj) + getsizeof(getattr(obj, "__dict__", None) or {})
+
+
+@lru_cache(maxsize=None)
+def dict_bytes(length):
+    """Bytes of a dictionary with length keys (like Group.members_id)"""
+    return getsizeof(dict.fromkeys(range(length)))
+
+
+def usage(world):
+    """Bytes held by each structure of the simulation, counted explicitly:
+    the animal lists (objects included, also the dead ones still there), the
+    stores, the groups, the shared graveyards, the arrays of the world, the
+    distance fields (see Objects.Paths) and the history (in memory, the images
+    are on disk, see history_file). The sizes
+    of the objects are measured on one of them, so this is fast enough to be
+    done every day"""
+    result = {}
+    for name, plural, animals, store, attribute in SPECIES:
+        animal = sizeof(animals[0]) if animals else 0
+        result[plural] = getsizeof(animals) + len(animals)*animal
+        result[f"{name}_store"] = store.nbytes()
+        # groups are counted from the group column of the alive animals
+        groups = store.group[:store.size][store.alive[:store.size]]
+        _, members = np.unique(groups[groups >= 0], return_counts=True)
+        alive = store.alive[:store.size]
+        group = sizeof(getattr(animals[int(alive.argmax())], attribute)) \
+            if alive.any() else 0
+        result[f"{attribute}s"] = len(members)*group + \
+            sum(dict_bytes(k) for k in members.tolist())
+    graveyard = next(iter(GRAVEYARDS.values()), None)
+    result["graveyards"] = getsizeof(GRAVEYARDS) + len(GRAVEYARDS)*(
+        sizeof(graveyard) + sizeof(graveyard.vegetob) if graveyard else 0)
+    result["world"] = world.vegetation.nbytes + world.water.nbytes + \
+        world.herd_energy.energy.nbytes + world.herd_energy.count.nbytes + \
+        world.grid.size*sizeof(world.grid.flat[0])
+    result["paths"] = world.paths.nbytes()
+    result["history"] = world.history.counts.nbytes
+    result["history_file"] = world.history.file_size
+    return result
+
+
+def total(world):
+    """Bytes held in memory by the simulation, compared with
+    variables.MEMORY_BUDGET: the history file is excluded, and so are the
+    distance fields, which have their own budget (see Objects.Paths)"""
+    return sum(value for key, value in usage(world).items()
+               if key not in ("history_file", "paths"))
+
+
+def report(world):
+    """Human readable table of usage"""
+    return "\n".join(f"{key:>14}: {value/2**20:10.2f} MB"
+                     for key, value in usage(world).items())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+from collections import OrderedDict
+import numpy as np
+import variables
+
+
+class DistanceFields:
+    """Number of moves needed to reach a target cell from the cells around it,
+    a move going from a land cell to another one at distance at most near
+    according to the metric, as a group does in a day (near is 2 for the
+    prides, see Pride.move_towards). The field of a target is computed with a
+    breadth first visit of the land mask in a square around it, as large as
+    needed for the groups that went towards it (at most radius), and it is
+    cached until the geology changes (see World.set_water), so the groups
+    going towards the same cell for many days look it up instead of computing
+    it again. The least recently used fields are forgotten when the cache
+    takes more than budget bytes"""
+    def __init__(self, world, radius=None, budget=32*2**20):
+        self.world = world
+        # the prides look for preys at distance num_cells//10, twice as much
+        # leaves room to go around the lakes
+        self.radius = radius or 2*max(world.num_cells//10,
+                                      world.neighborhood, 2)
+        self.budget = budget
+        self.bytes = 0  # bytes of the fields in the cache
+        # (metric, near, x, y) -> (x0, y0, steps, hops, radius)
+        self.fields = OrderedDict()
+
+    def __repr__(self):
+        return f"DistanceFields({self.world}, {len(self.fields)} fields)"
+
+    def clear(self):
+        self.fields.clear()
+        self.bytes = 0
+
+    def nbytes(self):
+        return self.bytes
+
+    def field(self, target, near=None, reach=0):
+        """Returns the corner (x0, y0) of the square around target, the
+        moves from each of its cells to target (-1 if it can't be reached)
+        and the flat index of the cell where to go from each of them (see
+        step). The square reaches at least the cells at reach from target
+        (along the axes), with as much room again to go around the lakes (see
+        step if it's not enough)"""
+        if near is None: near = self.world.neighborhood
+        key = (variables.DISTANCE, near, target.x, target.y)
+        # rounded to a power of two, so that a field is computed again only a
+        # few times for farther and farther groups
+        r = min(self.radius, 1 << (2*max(reach, near) - 1).bit_length())
+        if key in self.fields:
+            field = self.fields[key]
+            if field[4] >= r:
+                self.fields.move_to_end(key)
+                return field
+            self.bytes -= field[2].nbytes + field[3].nbytes
+            del self.fields[key]
+        n = self.world.num_cells
+        x0, x1 = max(target.x-r, 0), min(target.x+r+1, n)
+        y0, y1 = max(target.y-r, 0), min(target.y+r+1, n)
+        # the square is padded with near water cells on each side, so the
+        # moves from its cells never go out of the (flat) arrays
+        h, w = x1 - x0 + 2*near, y1 - y0 + 2*near
+        land = np.zeros((h, w), dtype=bool)
+        land[near:h-near, near:w-near] = ~self.world.water[x0:x1, y0:y1]
+        land = land.ravel()
+        dx, dy = np.nonzero(self.world.stencil(near))
+        offsets = (dx - near)*w + dy - near  # in row-major order
+        steps = np.full(h*w, -1, dtype=np.int32)
+        frontier = np.array([(target.x-x0+near)*w + target.y-y0+near])
+        steps[frontier] = 0
+        # a cell reached from many cells of the frontier is kept once, at the
+        # last of its positions in reached (the one written last in first)
+        first = np.empty(h*w, dtype=np.int64)
+        d = 0
+        while len(frontier):
+            d += 1
+            reached = (frontier[:, None] + offsets).ravel()
+            reached = reached[land[reached] & (steps[reached] < 0)]
+            order = np.arange(len(reached))
+            first[reached] = order
+            frontier = reached[first[reached] == order]
+            steps[frontier] = d
+        # the move of each reachable cell: among the land cells at distance
+        # at most near, the one with the fewest moves left and then the
+        # nearest to target, the first one (as in get_neighbors) if tied
+        xs, ys = np.mgrid[x0-near:x1+near, y0-near:y1+near]
+        distance = self.world.metric(xs - target.x, ys - target.y).ravel()
+        cells = np.flatnonzero(steps >= 0)
+        moves = cells[:, None] + offsets
+        value = steps[moves].astype(np.float64)
+        value[value < 0] = np.inf
+        best = moves[np.arange(len(cells)),
+                     np.argmin(value*(distance.max()+1) + distance[moves],
+                               axis=1)]
+        hops = np.full(h*w, -1, dtype=np.int64)
+        hops[cells] = (xs.ravel()*n + ys.ravel())[best]
+        steps = steps.reshape(h, w)[near:h-near, near:w-near].copy()
+        hops = hops.reshape(h, w)[near:h-near, near:w-near].copy()
+        self.fields[key] = x0, y0, steps, hops, r
+        self.bytes += steps.nbytes + hops.nbytes
+        while self.bytes > self.budget and len(self.fields) > 1:
+            _, (_, _, old_steps, old_hops, _) = self.fields.popitem(last=False)
+            self.bytes -= old_steps.nbytes + old_hops.nbytes
+        return self.fields[key]
+
+    def step(self, cell, target, near=None):
+        """Returns the land cell at distance at most near from cell (see
+        World.get_neighbors) with the fewest moves to target, and among them
+        the nearest to target according to the metric. Returns None if
+        target can't be reached from any of them"""
+        if near is None: near = self.world.neighborhood
+        world = self.world
+        reach = max(abs(cell.x - target.x), abs(cell.y - target.y))
+        # targets at most two moves away don't need a field: the move is
+        # to the target, or to the nearest cell one move away from it
+        if reach <= 2*near:
+            rows, cols, mask = world.window(cell, near, flag="land")
+            xs, ys = np.nonzero(mask)
+            distance = world.metric(xs + rows.start - target.x,
+                                    ys + cols.start - target.y)
+            close = np.flatnonzero(distance <= near)
+            if len(close):
+                best = close[np.argmin(distance[close])]
+                return world.grid[xs[best] + rows.start,
+                                  ys[best] + cols.start]
+        while True:
+            x0, y0, _, hops, r = self.field(target, near, reach)
+            x, y = cell.x - x0, cell.y - y0
+            if 0 <= x < hops.shape[0] and 0 <= y < hops.shape[1] and \
+                    hops[x, y] >= 0:
+                return world.grid.flat[hops[x, y]]
+            if r >= self.radius:
+                return None
+            # the way around the lakes goes out of the square
+            reach = r
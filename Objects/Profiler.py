@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+import csv
+import functools
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Profiler:
+    """Time spent in each phase of the day and number of calls of some hot
+    functions, collected in one row per simulated day.
+    When disabled it costs nothing but a check per phase: the counted
+    functions are wrapped only while it is enabled (see Profiler.enable)"""
+    def __init__(self):
+        self.enabled = False
+        self.day = None  # day the current row refers to
+        self.current = {}
+        self.rows = []
+        self.originals = []  # (class, name, function) replaced by enable
+
+    def __repr__(self):
+        return f"Profiler({'enabled' if self.enabled else 'disabled'}, \
+{len(self.rows)} days)"
+
+    def targets(self):
+        """The functions that are wrapped, as (class, name, key, timed): their
+        calls are counted in key_calls and, if timed, their time in key_time"""
+        from Objects.World import World
+        from Objects.Ecosystem import Group, Herd, Pride
+        return [(World, "get_neighbors", "get_neighbors", False),
+                (Group, "remove", "group_remove", False),
+                (Herd, "choose", "herds", True),
+                (Pride, "choose", "prides", True),
+                (Pride, "hunt", "hunts", False),
+                (Pride, "fight", "fights", True)]
+
+    def enable(self):
+        if self.enabled:
+            return
+        for cls, name, key, timed in self.targets():
+            function = cls.__dict__[name]
+            self.originals.append((cls, name, function))
+            setattr(cls, name, self.wrap(function, key, timed))
+        self.enabled = True
+
+    def disable(self):
+        for cls, name, function in self.originals:
+            setattr(cls, name, function)
+        self.originals = []
+        self.enabled = False
+
+    def wrap(self, function, key, timed):
+        add = self.add
+        if timed:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    add(f"{key}_time", perf_counter() - start)
+                    add(f"{key}_calls", 1)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                add(f"{key}_calls", 1)
+                return function(*args, **kwargs)
+        return wrapper
+
+    def add(self, key, value):
+        self.current[key] = self.current.get(key, 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        """Times the code in the with block as name_time"""
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}_time", perf_counter() - start)
+
+    def start_day(self, frame):
+        """Closes the row of the previous day, the next measures belong to
+        the day frame"""
+        if not self.enabled:
+            return
+        if self.day is not None:
+            self.rows.append({"day": self.day, **self.current})
+        self.day = frame
+        self.current = {}
+
+    def table(self):
+        """List of the rows of the days profiled until now, as dictionaries"""
+        if self.current or self.day is not None:
+            return self.rows + [{"day": self.day, **self.current}]
+        return list(self.rows)
+
+    def save(self, path):
+        """Writes the table in the csv file path, one column per measure"""
+        rows = self.table()
+        columns = ["day"] + sorted({key for row in rows for key in row} -
+                                   {"day"})
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, columns, restval=0)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+PROFILER = Profiler()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import numpy as np
+from Objects import Checkpoint
+
+
+class Rewind:
+    """Keeps what is needed to put a World back exactly as it was at the end
+    of any of its past days: the state of the world and of the random
+    generator (see Objects.Checkpoint.state) every every days, the keyframes,
+    and the changes made by the user on each day in between (see
+    World.intervene), which are the only things that the simulation does not
+    compute again by itself. A past day is restored from the keyframe before
+    it, simulating again at most every days; the demographics and the images
+    are not copied in the keyframes, they are read from the history. At most
+    limit keyframes are kept (see thin), so the memory used does not grow with
+    the length of the simulation"""
+    def __init__(self, world, every=50, limit=20):
+        self.world = world
+        self.every = every
+        self.limit = limit
+        self.keyframes = {}  # (state, random state) at the end of each day
+        self.changes = {}  # arguments of World.intervene of each day
+        self.reset()
+
+    def __repr__(self):
+        return f"Rewind({self.world}, {len(self.keyframes)} keyframes)"
+
+    def reset(self):
+        """Forgets everything, the last day of the history becomes the first
+        one that can be restored (e.g. after loading a checkpoint)"""
+        self.keyframes.clear()
+        self.changes.clear()
+        self.keep(len(self.world.history)-1)
+
+    def keep(self, frame, state=None, rng=None):
+        if state is None:
+            state, rng = Checkpoint.state(self.world), np.random.get_state()
+        self.keyframes[frame] = ({key: value for key, value in state.items()
+                                  if key not in ("counts", "status")}, rng)
+        if len(self.keyframes) > self.limit:
+            self.thin()
+
+    def thin(self):
+        """Forgets every other keyframe of the older half, the first one
+        excluded: the recent days are restored simulating again at most every
+        days, the older ones more and more of them. The days are in
+        increasing order"""
+        days = list(self.keyframes)
+        for day in days[1:len(days) - self.limit//2:2]:
+            del self.keyframes[day]
+
+    def forget(self, frame):
+        """Forgets the day frame and the following ones. The days are added
+        in increasing order, so they are popped from the end"""
+        for days in (self.keyframes, self.changes):
+            while days and next(reversed(days)) >= frame:
+                days.popitem()
+
+    def record(self, frame, state=None, rng=None):
+        """Called after simulating the day frame, the following ones (if
+        any) were of another future. state and rng are the ones at the end of
+        the day, if they are already known"""
+        self.forget(frame)
+        if frame % self.every == 0:
+            self.keep(frame, state, rng)
+
+    def log(self, frame, changes):
+        """Records the changes made at the end of the day frame"""
+        self.changes.setdefault(frame, []).append(changes)
+
+    def restorable(self, frame):
+        """Whether the day frame comes after a keyframe: the days before the
+        first one (e.g. before a checkpoint that was loaded, see reset) can
+        only be shown. The days are in increasing order"""
+        return bool(self.keyframes) and next(iter(self.keyframes)) <= frame
+
+    def restore(self, frame):
+        """Puts the world back at the end of the day frame, its changes
+        included, and forgets the following days. The changes of every day
+        are kept, also the ones between the keyframes forgotten by thin"""
+        world = self.world
+        if world.ahead is not None:
+            world.ahead.sync()
+        if not self.restorable(frame):
+            raise ValueError(f"Day {frame} is before the first keyframe")
+        start = max(day for day in self.keyframes if day <= frame)
+        state, rng = self.keyframes[start]
+        changes = {day: self.changes.get(day, []) for day in
+                   range(start, frame+1)}
+        history = world.history
+        Checkpoint.restore(world, {**state,
+                                   "counts": history.counts[:start+1].copy(),
+                                   "status": np.array(history.frames[start])})
+        np.random.set_state(rng)
+        self.forget(start+1)
+        self.changes.pop(start, None)
+        # simulated in series, the process of world.ahead would start again
+        # from the day of the keyframe
+        ahead, world.ahead = world.ahead, None
+        try:
+            for day in range(start, frame+1):
+                if day > start:
+                    world.simulate(day)
+                for change in changes[day]:
+                    self.log(day, change)
+                    world.intervene(day, **change)
+        finally:
+            world.ahead = ahead
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+from Objects.World import World
+from Objects.Tiles import TiledEngine
+from Objects.Checkpoint import CHECKPOINTER
+from errors import TotalExtinction
+
+
+class Simulation:
+    """Headless driver of a World: advances the simulation one day at a time
+    without creating any figure, Tk window or animation. If tiles is given,
+    the movement phase of each day is split in tiles x tiles tiles simulated
+    by a pool of processes (see Objects.Tiles). If checkpoint_every is given,
+    a checkpoint is saved in background every checkpoint_every days (see
+    Objects.Checkpoint.Checkpointer). If images is False the history of the
+    world keeps only the number of animals of each day"""
+    def __init__(self, num_cells, neighborhood, world=None, tiles=None,
+                 processes=None, checkpoint_every=None, images=True):
+        self.world = world if world else World(num_cells, neighborhood,
+                                               headless=True, images=images)
+        if tiles:
+            self.world.engine = TiledEngine(self.world, tiles, processes)
+        self.frame = len(self.world.history) - 1
+        self.checkpoint_every = checkpoint_every
+
+    def __repr__(self):
+        return f"Simulation({self.world}, day {self.frame})"
+
+    def stats(self):
+        """Statistics of the last simulated day"""
+        num_erbasts, num_carvizes = \
+            self.world.history.counts[self.frame].tolist()
+        return {"day": self.frame, "erbasts": num_erbasts,
+                "carvizes": num_carvizes}
+
+    def step(self):
+        """Simulates the next day and returns its statistics, raises
+        TotalExtinction if no animal is left"""
+        self.frame += 1
+        _, (num_erbasts, num_carvizes) = self.world.simulate(self.frame)
+        if num_erbasts + num_carvizes == 0:
+            raise TotalExtinction
+        if self.checkpoint_every and self.frame % self.checkpoint_every == 0:
+            CHECKPOINTER.submit(f'checkpoints/checkpoint_{self.frame}.npz',
+                                self.world)
+        return self.stats()
+
+    def run(self, days):
+        """Generator yielding the statistics of each of the next days, stops
+        earlier in case of total extinction"""
+        for _ in range(days):
+            try:
+                yield self.step()
+            except TotalExtinction:
+                return
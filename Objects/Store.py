@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+import numpy as np
+
+# name and type of each column of the store
+COLUMNS = {"energy": np.float64,
+           "lifetime": np.float64,
+           "age": np.int64,
+           "social_attitude": np.float64,
+           "alive": bool,
+           "cell": np.int64,    # x*num_cells + y of the position of the animal
+           "group": np.int64}   # gid of the Herd or Pride of the animal
+
+
+class AnimalStore:
+    """Structure of arrays holding the attributes of all the animals of one
+    species: row i contains the data of the animal whose id is i, so that
+    operations on the whole population (like aging) are vectorized. The
+    classes Erbast and Carviz read and write their attributes from here.
+    Ids are stable: the row of a dead animal is released and reused by a
+    newborn, instead of renumbering the whole population"""
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.free = []  # released rows, ready to be reused
+        # rows released during the current day, they become free only at the
+        # next one so that the dead animals can still be inspected until then
+        self.pending = []
+        self.index = None  # optional EnergyIndex kept in sync with the columns
+        # animals born and dead (by cause) since the store was created, also
+        # across clear, read by the telemetry (see Objects.Telemetry)
+        self.births = 0
+        self.deaths = {}
+        # energy of the alive animals, kept up to date by every method that
+        # changes it (the population is size minus the free and pending rows)
+        self.total_energy = 0.0
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"AnimalStore({self.size}, {self.population} alive)"
+
+    @property
+    def population(self):
+        return self.size - len(self.free) - len(self.pending)
+
+    @property
+    def capacity(self):
+        return len(self.alive)
+
+    def per_cell(self, cells, groups):
+        """Number of alive animals in each of the cells (by flat index). The
+        members of a group are counted in the cell of the group, given by
+        groups (gid -> flat index), since they are not always where it is
+        (e.g. they had no energy to follow it); the others in their own"""
+        alive = self.alive[:self.size]
+        where = self.cell[:self.size][alive]
+        if groups:
+            gids = np.fromiter(groups, dtype=np.int64, count=len(groups))
+            order = np.argsort(gids)
+            gids = gids[order]
+            group_cells = np.fromiter(groups.values(), dtype=np.int64,
+                                      count=len(groups))[order]
+            group = self.group[:self.size][alive]
+            k = np.minimum(np.searchsorted(gids, group), len(gids)-1)
+            found = gids[k] == group
+            where = np.where(found, group_cells[k], where)
+        return np.bincount(where[where >= 0], minlength=cells)
+
+    def reserve(self, capacity):
+        """Makes room for at least capacity animals, doubling the arrays"""
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2*self.capacity)
+        for name in COLUMNS:
+            column = getattr(self, name)
+            new_column = np.zeros(new_capacity, dtype=column.dtype)
+            new_column[:self.size] = column[:self.size]
+            setattr(self, name, new_column)
+
+    def allocate(self, energy, lifetime, social_attitude):
+        """Adds a newborn animal and returns its id, which is a free row if
+        there is one"""
+        if self.free:
+            i = self.free.pop()
+        else:
+            self.reserve(self.size + 1)
+            i = self.size
+            self.size += 1
+        self.births += 1
+        self.total_energy += energy
+        self.energy[i] = energy
+        self.lifetime[i] = lifetime
+        self.social_attitude[i] = social_attitude
+        self.age[i] = 0
+        self.alive[i] = True
+        self.cell[i] = -1
+        self.group[i] = -1
+        return i
+
+    def set_energy(self, i, energy):
+        if self.alive[i]:
+            self.total_energy += energy - self.energy[i]
+            if self.index is not None:
+                self.index.add(self.cell[i], energy - self.energy[i])
+        self.energy[i] = energy
+
+    def add_energy(self, ids, energy):
+        """Adds energy to each of the animals in ids (array)"""
+        self.energy[ids] += energy
+        self.total_energy += energy*np.count_nonzero(self.alive[ids])
+        if self.index is not None:
+            np.add.at(self.index.energy, self.cell[ids][self.alive[ids]],
+                      energy)
+
+    def move(self, i, cell):
+        """Moves the animal with id i to the cell with flat index cell"""
+        if self.index is not None and self.alive[i]:
+            if self.cell[i] >= 0:
+                self.index.add(self.cell[i], -self.energy[i], -1)
+            self.index.add(cell, self.energy[i], 1)
+        self.cell[i] = cell
+
+    def release(self, i, reason=None):
+        """Marks the animal with id i as dead, its row will be reused from the
+        next day on (see recycle)"""
+        self.deaths[reason] = self.deaths.get(reason, 0) + 1
+        self.total_energy -= self.energy[i]
+        if self.index is not None and self.cell[i] >= 0:
+            self.index.add(self.cell[i], -self.energy[i], -1)
+        self.alive[i] = False
+        self.pending.append(i)
+
+    def recycle(self):
+        """Makes the rows released until now available to newborns"""
+        self.free += self.pending
+        self.pending = []
+
+    def compact(self, keep):
+        """Keeps only the rows in keep (sorted array of ids), renumbered from 0
+        in the same order, and shrinks the arrays to twice the rows kept"""
+        size = len(keep)
+        capacity = max(1024, 2*size)
+        for name in COLUMNS:
+            column = np.zeros(capacity, dtype=COLUMNS[name])
+            column[:size] = getattr(self, name)[keep]
+            setattr(self, name, column)
+        self.size = size
+        self.free = []
+        self.pending = []
+        self.recount()
+
+    def recount(self):
+        """Computes again total_energy from the columns, after they have been
+        written directly (e.g. restoring a checkpoint)"""
+        self.total_energy = float(
+            self.energy[:self.size][self.alive[:self.size]].sum())
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def clear(self):
+        self.size = 0
+        self.free = []
+        self.pending = []
+        self.total_energy = 0.0
+
+    def grow(self):
+        """Ages all the alive animals by one day, and returns the ids of the
+        ones that have to die and the respective reasons. An animal dies if its
+        age reached its lifetime, or with a probability that increases as its
+        energy gets lower than 5 (see also Animal.grow)"""
+        n = self.size
+        alive = self.alive[:n]
+        self.age[:n][alive] += 1
+        overage = alive & (self.age[:n] >= self.lifetime[:n])
+        lack_energy = alive & (np.random.random(n)*self.energy[:n] < 5)
+        dying = np.flatnonzero(overage | lack_energy)
+        reasons = np.where(overage[dying], "overage", "lack_energy")
+        return dying.tolist(), reasons.tolist()
+
+
+class EnergyIndex:
+    """Spatial index of the animals of one species: total energy and number of
+    the alive animals in each cell, and number of animals in each square block
+    of cells, so that empty regions can be skipped without looking at their
+    cells. It is kept up to date by the AnimalStore it is attached to"""
+    def __init__(self, num_cells, block=8):
+        self.num_cells = num_cells
+        self.block = block
+        self.energy = np.zeros(num_cells*num_cells)
+        self.count = np.zeros(num_cells*num_cells, dtype=np.int64)
+        num_blocks = -(-num_cells // block)
+        self.blocks = np.zeros((num_blocks, num_blocks), dtype=np.int64)
+        x, y = np.divmod(np.arange(num_cells*num_cells), num_cells)
+        self.block_of = (x//block)*num_blocks + y//block
+
+    def __repr__(self):
+        return f"EnergyIndex({self.num_cells}, {self.count.sum()} animals)"
+
+    def add(self, cell, energy, count=0):
+        """Adds energy (and count animals) to the cell with flat index cell"""
+        self.energy[cell] += energy
+        if count:
+            self.count[cell] += count
+            self.blocks.flat[self.block_of[cell]] += count
+            if self.count[cell] == 0:
+                # avoids leaving rounding errors in empty cells
+                self.energy[cell] = 0
+
+    def rebuild(self, store):
+        """Recomputes the whole index from the columns of the store"""
+        alive = store.alive[:store.size]
+        cells = store.cell[:store.size][alive]
+        size = self.num_cells*self.num_cells
+        self.energy = np.bincount(cells, store.energy[:store.size][alive],
+                                  minlength=size)
+        self.count = np.bincount(cells, minlength=size)
+        self.blocks = np.bincount(self.block_of[cells],
+                                  minlength=self.blocks.size
+                                  ).reshape(self.blocks.shape)
+
+    def occupied(self, rows, cols):
+        """Returns the coordinates of the cells with at least one animal in
+        the window given by the slices rows and cols, together with their
+        energy. Only the bounding box of the non empty blocks is scanned"""
+        b = self.block
+        bx0, by0 = rows.start//b, cols.start//b
+        bx, by = np.nonzero(self.blocks[bx0:(rows.stop-1)//b+1,
+                                        by0:(cols.stop-1)//b+1])
+        if len(bx) == 0:
+            return np.array([], dtype=int), np.array([], dtype=int), \
+                np.array([])
+        x0 = max(rows.start, (bx.min()+bx0)*b)
+        x1 = min(rows.stop, (bx.max()+bx0+1)*b)
+        y0 = max(cols.start, (by.min()+by0)*b)
+        y1 = min(cols.stop, (by.max()+by0+1)*b)
+        shape = (self.num_cells, self.num_cells)
+        xs, ys = np.nonzero(self.count.reshape(shape)[x0:x1, y0:y1])
+        xs += x0
+        ys += y0
+        return xs, ys, self.energy.reshape(shape)[xs, ys]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import atexit
+import csv
+import os
+from variables import ERBAST_STORE, CARVIZ_STORE
+
+# causes of death with their own column, the others are counted as "other"
+CAUSES = ("overage", "lack_energy", "overcrowding", "lack_energy_movement",
+          "fight", "hunted_down", "bomb")
+SPECIES = (("erbast", ERBAST_STORE, "erbasts"),
+           ("carviz", CARVIZ_STORE, "carvizes"))
+
+
+class CsvTelemetry:
+    """Sink of the statistics of each simulated day, to be put in World.sinks.
+    One row per day is appended to the csv file path: populations, total
+    energy, mean density of the vegetobs, births and deaths by cause of each
+    species. Rows are written in batches of batch days, and the file is only
+    appended to, so it can be read while the simulation is running (a day
+    simulated again after going back to a checkpoint gets a new row)"""
+    def __init__(self, path, batch=100):
+        self.path = path
+        self.batch = batch
+        self.rows = []
+        self.columns = ["day", "erbasts", "carvizes", "erbast_energy",
+                        "carviz_energy", "vegetation"]
+        for name, _, _ in SPECIES:
+            self.columns.append(f"{name}_births")
+            self.columns += [f"{name}_{cause}" for cause in CAUSES + ("other",)]
+        self.last = self.counters()
+        # the last rows are written also if the simulation is interrupted
+        atexit.register(self.flush)
+
+    def __repr__(self):
+        return f"CsvTelemetry({self.path}, {len(self.rows)} rows pending)"
+
+    @staticmethod
+    def counters():
+        return {name: (store.births, dict(store.deaths))
+                for name, store, _ in SPECIES}
+
+    def record(self, world, frame):
+        """Called by the world after simulating the day frame"""
+        num_erbasts, num_carvizes = world.history.counts[frame].tolist()
+        land = ~world.water
+        row = [frame, num_erbasts, num_carvizes,
+               world.total_energy("erbasts"), world.total_energy("carvizes"),
+               world.vegetation[land].mean() if land.any() else 0]
+        counters = self.counters()
+        for name, _, _ in SPECIES:
+            births, deaths = counters[name]
+            last_births, last_deaths = self.last[name]
+            died = {reason: number - last_deaths.get(reason, 0)
+                    for reason, number in deaths.items()}
+            row.append(births - last_births)
+            row += [died.pop(cause, 0) for cause in CAUSES]
+            row.append(sum(died.values()))
+        self.last = counters
+        self.rows.append(row)
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Appends the pending rows to the file"""
+        if not self.rows:
+            return
+        header = not os.path.exists(self.path) or \
+            os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(self.columns)
+            writer.writerows(self.rows)
+        self.rows = []
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+import multiprocessing as mp
+import numpy as np
+from Objects.Cell import Graveyard
+from Objects.Ecosystem import Group, Herd, Pride
+from Objects.Profiler import PROFILER
+from Objects.Trajectory import Trajectory
+from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH, ERBAST_STORE, \
+    CARVIZ_STORE
+
+# engine whose tile is being simulated, set before forking the workers so that
+# they inherit the whole world without pickling it
+ENGINE = None
+SPECIES = (("Erbast", ERBASTS, ERBAST_STORE, Herd),
+           ("Carviz", CARVIZES, CARVIZ_STORE, Pride))
+
+
+class TiledEngine:
+    """Runs the movement phase of the day splitting the grid in tiles x tiles
+    square tiles, each one simulated by a different process.
+
+    Every worker is forked from the main process, so it can read the whole
+    world as it was at the beginning of the phase, but it only moves the groups
+    that start in its tile. The groups of the other tiles, and the empty ones
+    left in the halo around the tile (the cells that can be reached in one day
+    from it), are removed from the copy of the worker, so that its groups never
+    interact with the ones of other tiles. At the end of the phase each worker
+    sends back its groups (also the ones that migrated out of the tile), the
+    columns of its animals and the vegetation of its tile; then the main
+    process puts them back in the grid, and the encounters between groups
+    coming from different tiles (joining, fighting and hunting) happen there.
+
+    The engine can't be used together with the graphical interface, since it
+    forks the process."""
+    def __init__(self, world, tiles, processes=None):
+        self.world = world
+        n = world.num_cells
+        bounds = np.linspace(0, n, tiles+1).astype(int)
+        self.tiles = [(bounds[i], bounds[i+1], bounds[j], bounds[j+1])
+                      for i in range(tiles) for j in range(tiles)
+                      if bounds[i] < bounds[i+1] and bounds[j] < bounds[j+1]]
+        self.processes = processes
+        # groups move at most by max(neighborhood, 2) cells in a day, and
+        # single animals can leave them from where they stayed the day before
+        self.halo = 2*max(world.neighborhood, 2)
+        self.where = None  # see owners, computed before forking the workers
+
+    def __repr__(self):
+        return f"TiledEngine({self.world}, {len(self.tiles)} tiles)"
+
+    def expand(self, tile):
+        """Bounds of the tile together with its halo"""
+        x0, x1, y0, y1 = tile
+        n = self.world.num_cells
+        return (max(x0-self.halo, 0), min(x1+self.halo, n),
+                max(y0-self.halo, 0), min(y1+self.halo, n))
+
+    def move(self, frame):
+        """Movement phase of the day frame, see World.day_events"""
+        global ENGINE
+        seeds = np.random.randint(2**31, size=len(self.tiles))
+        jobs = [(k, frame, seed) for k, seed in enumerate(seeds)]
+        self.where = self.owners()
+        ENGINE = self
+        try:
+            # every tile needs a fresh copy of the world, so each worker
+            # process simulates a single tile
+            context = mp.get_context("fork")
+            with context.Pool(self.processes, maxtasksperchild=1) as pool:
+                results = pool.map(run_tile, jobs, chunksize=1)
+        finally:
+            ENGINE = None
+        self.merge(results, frame)
+
+    def owners(self):
+        """The flat index of the cell that decides the tile of each animal, by
+        species: the cell of its group, since a member is not always where
+        its group is (e.g. it had no energy to follow it), or its own cell if
+        it is in no group"""
+        grid = self.world.grid
+        n = self.world.num_cells
+        where = {}
+        for name, _, store, cls in SPECIES:
+            cells = store.cell[:store.size].copy()
+            for cell in grid.flat:
+                group = getattr(cell, cls.member_attribute)
+                if group:
+                    cells[group.ids()] = cell.x*n + cell.y
+            where[name] = cells
+        return where
+
+    def simulate(self, k, frame):
+        """Runs in the worker: moves the groups of the k-th tile and returns
+        what changed (see TiledEngine.merge)"""
+        world = self.world
+        grid = world.grid
+        n = world.num_cells
+        x0, x1, y0, y1 = self.tiles[k]
+        hx0, hx1, hy0, hy1 = self.expand(self.tiles[k])
+        ids = {}
+        for name, _, store, cls in SPECIES:
+            alive = np.flatnonzero(store.alive[:store.size])
+            where = self.where[name][alive]
+            x, y = np.divmod(where, n)
+            inside = (x0 <= x) & (x < x1) & (y0 <= y) & (y < y1)
+            ids[name] = alive[inside]
+            # the groups of the other tiles are not seen by this one, also the
+            # empty ones left in the halo
+            for c in np.unique(where[~inside]).tolist():
+                setattr(grid[c // n, c % n], cls.member_attribute, None)
+        for x in range(hx0, hx1):
+            for y in range(hy0, hy1):
+                if not (x0 <= x < x1 and y0 <= y < y1):
+                    grid[x, y].herd = None
+                    grid[x, y].pride = None
+        sizes = [store.size for _, _, store, _ in SPECIES]
+        causes = {name: dict(CAUSE_OF_DEATH[name]) for name, *_ in SPECIES}
+        profile = dict(PROFILER.current)
+
+        for x in range(x0, x1):
+            for y in range(y0, y1):
+                cell = grid[x, y]
+                if cell.herd: cell.herd.choose(frame)
+                if cell.pride: cell.pride.choose(frame)
+
+        if sizes != [store.size for _, _, store, _ in SPECIES]:
+            raise RuntimeError("Animals can't be born during the movement \
+phase of a tiled engine")
+        result = {"vegetation": world.vegetation[x0:x1, y0:y1].copy(),
+                  "groups": [], "animals": {}, "causes": {},
+                  "profile": {key: value - profile.get(key, 0) for key, value
+                              in PROFILER.current.items()}}
+        for name, animals, store, cls in SPECIES:
+            index = ids[name]
+            alive = store.alive[index]
+            result["animals"][name] = (
+                index, store.energy[index], alive, store.cell[index],
+                [animals[i].pos.reason_of_death for i in index[~alive]])
+            result["causes"][name] = {
+                reason: number - causes[name].get(reason, 0) for
+                reason, number in CAUSE_OF_DEATH[name].items()
+                if number != causes[name].get(reason, 0)}
+            # the groups where the animals of the tile ended up, wherever they
+            # are now
+            groups = {}
+            for i in index[alive].tolist():
+                group = getattr(animals[i], cls.member_attribute)
+                if i in group.members_id and \
+                        getattr(group.pos, cls.member_attribute) is group:
+                    groups[id(group)] = group
+            for group in groups.values():
+                result["groups"].append((
+                    name, group.pos.x, group.pos.y,
+                    [i for i in group.members_id if store.alive[i]],
+                    [(c.x, c.y, v) for c, v in group.memory.items()],
+                    None if group.tracked is None else list(group.tracked)))
+        return result
+
+    def merge(self, results, frame):
+        """Puts the results of the tiles back in the world: first the
+        columns of the animals and the vegetation, then all the herds and
+        finally all the prides, so that prides arriving from a different tile
+        can hunt the herds they meet"""
+        world = self.world
+        grid = world.grid
+        n = world.num_cells
+        index, ERBAST_STORE.index = ERBAST_STORE.index, None
+        for cell in grid.flat:
+            cell.herd = None
+            cell.pride = None
+        # the tracked groups are put back by place
+        world.tracked.clear()
+        for k, result in enumerate(results):
+            x0, x1, y0, y1 = self.tiles[k]
+            world.vegetation[x0:x1, y0:y1] = result["vegetation"]
+            for name, animals, store, _ in SPECIES:
+                ids, energy, alive, cells, reasons = result["animals"][name]
+                store.energy[ids] = energy
+                store.cell[ids] = cells
+                for i, c in zip(ids[alive].tolist(), cells[alive].tolist()):
+                    animals[i]._pos = grid[c // n, c % n]
+                for i, reason in zip(ids[~alive].tolist(), reasons):
+                    store.release(i, reason)
+                    animals[i]._pos = Graveyard.get(
+                        *divmod(int(store.cell[i]), n), reason)
+                for reason, number in result["causes"][name].items():
+                    CAUSE_OF_DEATH[name][reason] = \
+                        CAUSE_OF_DEATH[name].get(reason, 0) + number
+
+            # the times of the workers add up to the cpu time of the phase
+            for key, value in result["profile"].items():
+                PROFILER.add(key, value)
+
+        for _, _, store, _ in SPECIES:
+            store.recount()
+
+        placed = {}  # tile that placed the herd of each cell
+        for kind in ("Erbast", "Carviz"):
+            for k, result in enumerate(results):
+                for group in result["groups"]:
+                    if group[0] == kind:
+                        self.place(k, *group, frame=frame, placed=placed)
+        ERBAST_STORE.index = index
+        index.rebuild(ERBAST_STORE)
+
+    def place(self, k, name, x, y, members, memory, tracked, frame, placed):
+        """Rebuilds in the main process a group sent back by the k-th tile,
+        and puts it in its cell"""
+        world = self.world
+        grid = world.grid
+        _, animals, _, cls = next(s for s in SPECIES if s[0] == name)
+        cell = grid[x, y]
+        # the constructor of the groups would already put it in the cell
+        group = cls.__new__(cls)
+        Group.__init__(group, cell, world, [animals[i] for i in members],
+                       None if tracked is None else Trajectory(tracked))
+        group.memory = {grid[a, b]: v for a, b, v in memory}
+        for i in members:
+            setattr(animals[i], cls.member_attribute, group)
+        if cls is Herd:
+            if cell.herd is None:
+                cell.herd = group
+                placed[cell] = k
+            else:
+                cell.add_herd(group)
+        elif cell.pride is None:
+            cell.pride = group
+            if cell.herd and placed[cell] != k:
+                group.hunt()
+        else:
+            cell.add_pride(group)
+
+
+def run_tile(job):
+    k, frame, seed = job
+    np.random.seed(seed)
+    return ENGINE.simulate(k, frame)
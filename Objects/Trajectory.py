@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+import numpy as np
+
+
+class Trajectory:
+    """Positions of a tracked group (see Group.track), one for each day it
+    was followed, in arrays grown by doubling. Iterating gives the
+    (day, x, y) of each position"""
+    def __init__(self, positions=(), capacity=16):
+        self.length = 0
+        self.days = np.zeros(capacity, dtype=np.int64)
+        self.xy = np.zeros((capacity, 2), dtype=np.int64)
+        for day, x, y in positions:
+            self.append(day, x, y)
+
+    def __repr__(self):
+        return f"Trajectory({self.length} days)"
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for day, (x, y) in zip(self.days[:self.length].tolist(),
+                               self.xy[:self.length].tolist()):
+            yield day, x, y
+
+    def append(self, day, x, y):
+        if self.length == len(self.days):
+            self.days = np.concatenate((self.days, np.zeros_like(self.days)))
+            self.xy = np.concatenate((self.xy, np.zeros_like(self.xy)))
+        self.days[self.length] = day
+        self.xy[self.length] = x, y
+        self.length += 1
+
+    def until(self, frame):
+        """Arrays of the x and y of the positions until the day frame
+        included (views, the days are in increasing order)"""
+        k = np.searchsorted(self.days[:self.length], frame, side="right")
+        return self.xy[:k, 0], self.xy[:k, 1]
+
+    def copy(self):
+        other = Trajectory(capacity=len(self.days))
+        other.length = self.length
+        other.days[:] = self.days
+        other.xy[:] = self.xy
+        return other
@@ -1,60 +1,143 @@
 #!/usr/bin/env python
 # from matplotlib.animation import FuncAnimation
-import pickle
-import tkinter as tk
-from Visualization import Interactive_Animation
-from matplotlib.widgets import Button
-from matplotlib import animation
-import matplotlib as mpl
+from collections import deque
+from math import hypot
 import numpy as np
 from numpy import random as rd
-from Objects.Cell import Cell
-from matplotlib import pyplot as plt
+from Objects.Cell import Cell, GRAVEYARDS
+from Objects.History import History
+from Objects.Profiler import PROFILER
+from Objects import Memory
+from Objects.Paths import DistanceFields
+from Objects.Store import EnergyIndex
 from errors import TotalExtinction
-from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH, DISTANCE
+import variables
+from variables import ERBASTS, CARVIZES, CAUSE_OF_DEATH, ERBAST_STORE, \
+    CARVIZ_STORE, PARAMETERS
 
 SAVED = []
+# masks of the neighborhoods, built once for each (metric, radius), see
+# World.stencil
+STENCILS = {}
 
 class World:
     """Class representing the world"""
-    def __init__(self, num_cells, neighborhood):
-        self.history = []
+    def __init__(self, num_cells, neighborhood, headless=False, images=True):
+        """If headless is True no figure is created, and the world can only be
+        advanced through World.simulate (see Objects.Simulation). If images
+        is False the history keeps only the number of animals of each day"""
         self.num_cells = num_cells
+        # statuses of the simulated days, kept on disk (see Objects.History)
+        self.history = History(num_cells, images=images)
         self.neighborhood = neighborhood
         self.grid = np.array([[Cell(x, y) for y in range(self.num_cells)]
                      for x in range(self.num_cells)])
+        # density of the vegetob of each cell (0 where there is none) and
+        # water mask, kept in sync with Cell.water through World.set_water
+        self.vegetation = np.zeros((num_cells, num_cells), dtype=np.float32)
+        self.water = np.zeros((num_cells, num_cells), dtype=bool)
+        # energy of the erbasts in each cell, used by the prides to find preys
+        self.herd_energy = EnergyIndex(num_cells)
+        ERBAST_STORE.index = self.herd_energy
+        # steps to reach the targets of the groups by land, see Objects.Paths
+        self.paths = DistanceFields(self)
+        # registry of the tracked groups by gid, see Group.track
+        self.tracked = {}
         self.pseudocenter = self.start_life()
-        self.fig, self.ax = self.create_plot()
+        self.headless = headless
+        # optional engine running the movement phase in parallel, see
+        # Objects.Tiles (headless only)
+        self.engine = None
+        # objects notified after each simulated day through
+        # sink.record(world, frame), e.g. Objects.Telemetry.CsvTelemetry
+        self.sinks = []
+        # optional process simulating the next days while the previous ones
+        # are shown, see Objects.Ahead (graphical interface only)
+        self.ahead = None
+        # optional keyframes to go back to any past day, see Objects.Rewind
+        # (graphical interface only)
+        self.rewind = None
+        # first day on which the memory is checked against
+        # variables.MEMORY_BUDGET, and days to wait after a compaction that
+        # freed nothing, see day_events
+        self.next_compaction = 0
+        self.compaction_wait = 1
+        # persistent artists of the figure, created by the first draw
+        self.artists = {}
+        self.fig, self.ax = (None, None) if headless else self.create_plot()
 
     def __repr__(self):
         return f"World({str(self.num_cells)}, {str(self.pseudocenter)})"
 
     def distance(self, cell1, cell2):
         """Returns the distance between two cells"""
-        if DISTANCE == "Euclidean":
-            return np.linalg.norm([abs(cell1.x-cell2.x), abs(cell1.y-cell2.y)])
-        if DISTANCE == "Manhattan":
+        # the metric is read at call time, since it can be changed from the
+        # command line after this module is imported
+        metric = variables.DISTANCE
+        if metric == "Euclidean":
+            return hypot(cell1.x-cell2.x, cell1.y-cell2.y)
+        if metric == "Manhattan":
             return abs(cell1.x-cell2.x) + abs(cell1.y-cell2.y)
-        if DISTANCE == "Chebyshev":
+        if metric == "Chebyshev":
             return max(abs(cell1.x-cell2.x), abs(cell1.y-cell2.y))
 
+    @staticmethod
+    def stencil(near):
+        """Returns the boolean (2near+1)x(2near+1) mask of the cells in the ball
+        of radius near centered in the middle of the square, according to the
+        current metric. Masks are cached for each (metric, radius)"""
+        key = (variables.DISTANCE, near)
+        if key not in STENCILS:
+            dx, dy = np.mgrid[-near:near+1, -near:near+1]
+            STENCILS[key] = World.metric(dx, dy) <= near
+        return STENCILS[key]
+
+    @staticmethod
+    def metric(dx, dy):
+        """Length of the vectors (dx, dy) (arrays) according to the current
+        metric"""
+        dx, dy = np.abs(dx), np.abs(dy)
+        if variables.DISTANCE == "Euclidean":
+            return np.hypot(dx, dy)
+        if variables.DISTANCE == "Manhattan":
+            return dx + dy
+        if variables.DISTANCE == "Chebyshev":
+            return np.maximum(dx, dy)
+        raise ValueError(f"Unknown metric {variables.DISTANCE}")
+
+    def window(self, cell: Cell, near=None, flag=None):
+        """Returns the slices of the square of radius near around the cell,
+        clipped to the borders of the world, and the mask of the cells of the
+        square that are in the neighborhood (and respect the flag, see
+        get_neighbors)"""
+        if near is None: near=self.neighborhood
+        x0, x1 = max(cell.x-near, 0), min(cell.x+near+1, self.num_cells)
+        y0, y1 = max(cell.y-near, 0), min(cell.y+near+1, self.num_cells)
+        rows, cols = slice(x0, x1), slice(y0, y1)
+        mask = self.stencil(near)[x0-cell.x+near:x1-cell.x+near,
+                                  y0-cell.y+near:y1-cell.y+near]
+        if flag == "water":
+            mask = mask & self.water[rows, cols]
+        elif flag == "land":
+            mask = mask & ~self.water[rows, cols]
+        return rows, cols, mask
 
     def get_neighbors(self, cell: Cell, near=None, flag=None):
-        """Returns the neighborhood of a cell, according to the distance defined"""
-        if near is None: near=self.neighborhood
-        neighborhood = []
-        for x in range(cell.x-near, cell.x+near+1):
-            for y in range(cell.y-near, cell.y+near+1):
-                if 0 <= min(x, y) <= max(x, y) < self.num_cells and self.distance(cell, self.grid[x, y]) <= near:
-                    if flag is None:
-                        neighborhood.append(self.grid[x, y])
-                    elif flag == "water":
-                        if self.grid[x, y].water:
-                            neighborhood.append(self.grid[x, y])
-                    elif flag == "land":
-                        if not self.grid[x, y].water:
-                            neighborhood.append(self.grid[x, y])
-        return neighborhood
+        """Returns the neighborhood of a cell, according to the distance
+        defined. If flag is "water" or "land" only the cells of that kind are
+        returned"""
+        rows, cols, mask = self.window(cell, near, flag)
+        return list(self.grid[rows, cols][mask])
+
+    def herd_targets(self, cell: Cell, near):
+        """Returns a dictionary with the cells at distance at most near from
+        cell where there are erbasts, and the total energy of the erbasts in
+        each of them, in row-major order. Uses the herd energy index instead
+        of looking at every cell of the neighborhood"""
+        rows, cols, _ = self.window(cell, near)
+        xs, ys, energies = self.herd_energy.occupied(rows, cols)
+        keep = self.stencil(near)[xs-cell.x+near, ys-cell.y+near]
+        return dict(zip(self.grid[xs[keep], ys[keep]], energies[keep].tolist()))
 
     def get_adjacent(self, cell: Cell, flag=None):
         """Returns the adjacent cells of a cell
@@ -80,49 +163,79 @@ class World:
 
     def start_life(self):
         """Starts the life of the world, generating randomly a world"""
-        x, y = rd.randint(0, self.num_cells, 2)
+        n = self.num_cells
+        x, y = rd.randint(0, n, 2)
         start_cell = self.grid[x, y]
-        pangea = [start_cell]
-        done = []
+        # the continent grows as a breadth first visit from the start cell,
+        # where each neighbor becomes land with a probability p that decreases
+        # with every cell accepted; done marks the cells already decided
+        pangea = deque([(x, y)])
+        done = np.zeros((n, n), dtype=bool)
+        land = np.zeros((n, n), dtype=bool)
         p = 1
-        while len(pangea) > 0:
-            cell = pangea.pop(0)
-            if cell in done:
+        while pangea:
+            x, y = pangea.popleft()
+            if done[x, y]:
                 continue
-            cell.spawn_vegetob(rd.randint(0, 100))
+            cell = self.grid[x, y]
+            cell.spawn_vegetob(rd.randint(0, 100), self)
             cell.add_herd(None, self)
             cell.add_pride(None, self)
-            done.append(cell)
-            for neighbor in self.get_adjacent(cell):
-                if neighbor in done:
+            done[x, y] = land[x, y] = True
+            # same order as get_adjacent
+            for a, b in ((x-1, y), (x+1, y), (x, y-1), (x, y+1)):
+                if not (0 <= a < n and 0 <= b < n) or done[a, b]:
                     continue
                 if rd.random() < p:
-                    p -= 1 / self.num_cells**2
-                    pangea.append(neighbor)
+                    p -= 1 / n**2
+                    pangea.append((a, b))
                 else:
-                    done.append(neighbor)
-                    neighbor.water = True
-        for row in self.grid:
-            for cell in row:
-                # this is not necessary, but it makes the world more realistic,
-                # since there are not little puddles of water in the middle of
-                # the land, there are only lakes bigger than a cell
-                if cell.water and all(c.vegetob is not None for c in self.get_adjacent(cell)):
-                    cell.water = False
-                    cell.spawn_vegetob(rd.randint(0, 100))
-                    continue
-                if cell not in done:
-                    cell.water = True
-        vegetob = [[0 if cell.vegetob is None else cell.vegetob.density/100
-                    for cell in row] for row in self.grid]
-
-        water = np.array([[cell.water for cell in row] for row in self.grid])
+                    done[a, b] = True
+        # this is not necessary, but it makes the world more realistic, since
+        # there are not little puddles of water in the middle of the land, there
+        # are only lakes bigger than a cell: a water cell whose adjacent cells
+        # are all land becomes land. The neighbors are counted shifting the
+        # padded mask, as a convolution with a cross
+        padded = np.pad(land, 1).astype(np.int8)
+        inside = np.pad(np.ones((n, n), dtype=np.int8), 1)
+        def adjacent(m):
+            return m[:-2, 1:-1] + m[2:, 1:-1] + m[1:-1, :-2] + m[1:-1, 2:]
+        puddles = ~land & (adjacent(padded) == adjacent(inside))
+        self.water[:] = ~(land | puddles)
+        for x, y in np.argwhere(self.water).tolist():
+            self.grid[x, y].water = True
+        for (x, y), density in zip(np.argwhere(puddles).tolist(),
+                                   rd.randint(0, 100, size=puddles.sum())):
+            self.grid[x, y].spawn_vegetob(density, self)
+        vegetob = self.vegetation/100
+        water = self.water
         status = np.dstack((water, water, vegetob+water))
         self.history.append((status, (0, 0)))
         return start_cell
 
+    def set_water(self, cell: Cell, water=True):
+        """Makes a cell water (or land), keeping the water mask in sync. The
+        distance fields computed until now are forgotten"""
+        cell.water = water
+        self.water[cell.x, cell.y] = water
+        self.paths.clear()
+
+    def grow_vegetation(self):
+        """Grows the vegetob of every land cell at once"""
+        # density growing according to a weird function I made up. It grows
+        # faster when density is low but not extremely low and approaches the
+        # limit of 100
+        # even logistic curve, resulted in the death of Erbasts
+        # density += density * (100 - density) / 10000
+        density = self.vegetation
+        minimum = PARAMETERS["vegetob_min_density"]
+        grown = np.where(density < minimum, minimum, density + density *
+                         (100 - density)**2 / PARAMETERS["vegetob_growth"])
+        np.copyto(density, grown, where=~self.water)
+
     def day(self, frame, info=None, change_geology=[], invert=False,
-            bomb=None, big=False, track_cancel=False, revive=None, save=False):
+            bomb=None, big=False, track_cancel=False, revive=None, save=False,
+            track=None, rewind=False):
         global CARVIZES, ERBASTS
         """Main function for the simulation, it runs a day or plots a previous
         day if already simulated
@@ -146,47 +259,100 @@ class World:
             revive: revives either erbasts or carvizes, respawning them randomly
                 all over the map
 
-            save: if True, saves the current status and history in a file as a
-                form of checkpoint (uses pickle)
+            save: if True, saves the current status in a file as a form of
+                checkpoint (see Objects.Checkpoint)
 
             track_cancel: if true, cancel all the future saved history and
-                status and restarts simulating from last saved checkpoint"""
+                status and restarts simulating from last saved checkpoint
+
+            track: coordinates of a cell whose herd and pride are followed
+                from now on, their paths are shown on the map
+
+            rewind: if True, the world is put back as it was in the day frame
+                and the following days are simulated again (see
+                Objects.Rewind)"""
+
+        if self.ahead is not None and (info or change_geology or bomb or save
+                                       or track_cancel or revive or track or
+                                       rewind):
+            # the world is changed, or looked at, as it is in the last day
+            # simulated; the days simulated in advance are thrown away
+            self.ahead.sync()
 
         if info:
             c = self.grid[info]
             self.show_info(c, frame)
 
+        changes = {"change_geology": list(change_geology), "invert": invert,
+                   "bomb": bomb, "big": big, "track": track, "revive": revive}
+        changed = change_geology or bomb or track or revive
+        if (rewind or changed) and self.rewind is not None and \
+                frame < len(self.history)-1 and self.rewind.restorable(frame):
+            # the changes are made to the day shown, the following ones are
+            # forgotten and simulated again
+            self.rewind.restore(frame)
+        if changed:
+            if self.rewind is not None:
+                self.rewind.log(len(self.history)-1, changes)
+            self.intervene(frame, **changes)
+
+        if save and len(self.history) <= frame+1:
+            from Objects.Checkpoint import CHECKPOINTER
+            # written in background, only the last ones are kept on disk
+            CHECKPOINTER.submit(f'checkpoints/checkpoint_{frame}.npz', self)
+            if frame not in SAVED:
+                SAVED.append(frame)
+            del SAVED[:-CHECKPOINTER.keep]
+
+        if track_cancel and SAVED:
+            from Objects import Checkpoint
+            frame = SAVED.pop()
+            Checkpoint.CHECKPOINTER.wait()
+            Checkpoint.load(f'checkpoints/checkpoint_{frame}.npz', self)
+            if self.rewind is not None:
+                self.rewind.reset()
+
+        if self.headless:
+            self.simulate(frame)
+        else:
+            self.plot(frame)
+        return frame
+
+    def intervene(self, frame, change_geology=(), invert=False, bomb=None,
+                  big=False, track=None, revive=None):
+        """Makes the changes of the user to the world (see day for the
+        arguments), the image of the day frame is painted accordingly. They
+        are the only events that are not simulated, so they are recorded to
+        be made again when rewinding (see Objects.Rewind)"""
         for coordinates in change_geology:
             c = self.grid[coordinates]
             if c.water and not invert:
-                c.water = False
-                c.spawn_vegetob(rd.randint(0,100))
-                self.history[frame][0][c.x, c.y, :] = 0
+                self.set_water(c, False)
+                c.spawn_vegetob(rd.randint(0,100), self)
+                self.history.paint(frame, c.x, c.y, 0)
             elif not c.water and invert:
-                c.water = True
+                self.set_water(c)
                 c.vegetob = None
+                self.vegetation[c.x, c.y] = 0
                 if c.herd: c.herd.suppress()
                 if c.pride: c.pride.suppress()
-                self.history[frame][0][c.x, c.y, :] = 1
+                self.history.paint(frame, c.x, c.y, 1)
 
         if bomb:
             center = self.grid[bomb]
             divisor = 3 if big else 10
-            for c in self.get_neighbors(center, self.num_cells//divisor):
-                if c.vegetob: c.vegetob.suppress()
+            rows, cols, mask = self.window(center, self.num_cells//divisor)
+            self.vegetation[rows, cols][mask] = 0
+            for c in self.grid[rows, cols][mask]:
                 if c.herd: c.herd.suppress()
                 if c.pride: c.pride.suppress()
-                self.history[frame][0][c.x, c.y, :] = 1 if c.water else 0
-
-        if save and len(self.history) <= frame+1:
-            SAVED.append(frame)
-            with open(f'checkpoints/checkpoint_{frame}.pkl', 'wb') as f:
-                pickle.dump((self.history, self.grid, CARVIZES, ERBASTS), f)
+                self.history.paint(frame, c.x, c.y, 1 if c.water else 0)
 
-        if track_cancel and SAVED:
-            frame = SAVED.pop()
-            with open(f'checkpoints/checkpoint_{frame}.pkl', 'rb') as f:
-                self.history, self.grid, CARVIZES, ERBASTS = pickle.load(f)
+        if track:
+            c = self.grid[track]
+            for group in (c.herd, c.pride):
+                if group:
+                    group.track(len(self.history)-1)
 
         if revive:
             for row in self.grid:
@@ -196,63 +362,205 @@ class World:
                     elif revive == "carvizes" and not cell.water:
                         cell.add_pride(None, self)
 
-        self.plot(frame)
-        return frame
-
     def day_events(self, frame):
         """Function defining the events of the day"""
         global ERBASTS, CARVIZES
+        # the ids of the animals that died yesterday can now be reused
+        ERBAST_STORE.recycle()
+        CARVIZ_STORE.recycle()
+        if variables.MEMORY_BUDGET and frame >= self.next_compaction and \
+                Memory.total(self) > variables.MEMORY_BUDGET:
+            with PROFILER.phase("compaction"):
+                compacted = self.compact()
+            # if nothing could be freed the memory is checked again after
+            # twice as many days as the last time
+            self.compaction_wait = 1 if compacted else 2*self.compaction_wait
+            self.next_compaction = frame + self.compaction_wait
         # Growing: the vegetob grows everywhere, in this phase also all animals
         # age and eventually die.
-        for row in self.grid:
-            for cell in row:
-                if cell.vegetob: cell.vegetob.grow()
-
-        for animal in ERBASTS+CARVIZES:
-            if animal.alive:
-                animal.grow()
+        with PROFILER.phase("vegetation"):
+            self.grow_vegetation()
+
+        with PROFILER.phase("aging"):
+            for animals, store in ((ERBASTS, ERBAST_STORE),
+                                   (CARVIZES, CARVIZ_STORE)):
+                dying, reasons = store.grow()
+                for i, reason in zip(dying, reasons):
+                    animals[i].die(reason)
         # Movement: The individuals of animal species decide if move in another
         # area. Movement is articulated as individual and social group movement,
         # in this phase it is also included Struggle, Fighting and Hunting.
-        for row in self.grid:
-            for cell in row:
-                if cell.herd: cell.herd.choose(frame)
-                if cell.pride: cell.pride.choose(frame)
-
-    def update_animals_indexes(self):
-        """Updates the indexes of the animals"""
-        global CARVIZES, ERBASTS
-        print(f"{len(CARVIZES)}, {len(ERBASTS)}", end=" -> ")
-
-        i = 0
-        for animal in list(CARVIZES):
-            if not animal.alive:
-                del CARVIZES[i]
-            else:
-                animal.id = i
-                i += 1
-        i = 0
-        for animal in list(ERBASTS):
-            if not animal.alive:
-                del ERBASTS[i]
-            else:
-                animal.id = i
-                i += 1
-
-        for row in self.grid:
-            for cell in row:
-                if cell.herd:
-                    cell.herd.clean(len(ERBASTS))
-                if cell.pride:
-                    cell.pride.clean(len(CARVIZES))
-
-        print(f"{len(CARVIZES)}, {len(ERBASTS)}")
+        with PROFILER.phase("movement"):
+            if self.engine:
+                self.engine.move(frame)
+                return
+            for row in self.grid:
+                for cell in row:
+                    if cell.herd: cell.herd.choose(frame)
+                    if cell.pride: cell.pride.choose(frame)
+
+    def compact(self):
+        """Forgets the dead animals, renumbering the alive ones from 0 in the
+        same order, and shrinks the stores. Called at the beginning of the day
+        when the memory used is over variables.MEMORY_BUDGET. Returns whether
+        any store was compacted"""
+        compacted = False
+        for animals, store, attribute in ((ERBASTS, ERBAST_STORE, "herd"),
+                                          (CARVIZES, CARVIZ_STORE, "pride")):
+            # not worth it if only a few rows would be freed
+            if len(store.free) + len(store.pending) < store.size//4 and \
+                    store.capacity <= max(1024, 2*store.size):
+                continue
+            keep = np.flatnonzero(store.alive[:store.size])
+            new_id = np.full(store.size, -1)
+            new_id[keep] = np.arange(len(keep))
+            new_id = new_id.tolist()
+            for cell in self.grid.flat:
+                group = getattr(cell, attribute)
+                if group:
+                    group.members_id = dict.fromkeys(
+                        new_id[i] for i in group.members_id
+                        if i < len(new_id) and new_id[i] >= 0)
+            store.compact(keep)
+            animals[:] = [animals[i] for i in keep.tolist()]
+            for i, animal in enumerate(animals):
+                animal._id = i
+            compacted = True
+        # no dead animal is left to lie there (the distance fields are kept,
+        # they don't refer to the animals and have their own budget)
+        if compacted:
+            GRAVEYARDS.clear()
+        return compacted
 
     def create_plot(self):
+        from matplotlib import pyplot as plt
         return plt.subplots(1, 2, figsize=(20, 10))
 
+    def simulate(self, frame):
+        """Runs the day events of the given frame if it was not simulated yet,
+        and returns its status and number of (erbasts, carvizes) as stored in
+        the history. Does not need any figure. The next day is taken from
+        self.ahead if there is one (see Objects.Ahead)"""
+        if len(self.history) == frame and self.ahead is not None and \
+                self.ahead.usable():
+            self.history.append(self.ahead.take(frame))
+            if self.rewind is not None:
+                self.rewind.record(frame, *self.ahead.pending)
+        elif len(self.history) <= frame:
+            PROFILER.start_day(frame)
+            self.day_events(frame)
+
+            with PROFILER.phase("status"):
+                n = self.num_cells
+                num_erbasts = self.total_animals("erbasts")
+                num_carvizes = self.total_animals("carvizes")
+                # the image is built only if the history keeps it
+                status = None
+                if self.history.images:
+                    water = self.water
+                    vegetob = self.vegetation/100
+                    # groups of 4 or more animals have the full color
+                    erbasts = ERBAST_STORE.per_cell(
+                        n*n, self.group_cells(ERBASTS, ERBAST_STORE, "herd"))
+                    carvizes = CARVIZ_STORE.per_cell(
+                        n*n, self.group_cells(CARVIZES, CARVIZ_STORE, "pride"))
+                    erbasts = np.minimum(erbasts/4, 1).reshape(n, n)
+                    carvizes = np.minimum(carvizes/4, 1).reshape(n, n)
+                    status = np.dstack((carvizes+water, erbasts+water,
+                                        vegetob+water))
+                self.history.append((status, (num_erbasts, num_carvizes)))
+            if self.rewind is not None:
+                with PROFILER.phase("rewind"):
+                    self.rewind.record(frame)
+            with PROFILER.phase("sinks"):
+                for sink in self.sinks:
+                    sink.record(self, frame)
+            if PROFILER.enabled:
+                for key, value in Memory.usage(self).items():
+                    PROFILER.current[f"{key}_bytes"] = value
+        return self.history[frame]
+
     def plot(self, frame, create=False):
         """Plots the world"""
+        status, (num_erbasts, num_carvizes) = self.simulate(frame)
+        with PROFILER.phase("plot"):
+            self.draw(frame, status, num_erbasts, num_carvizes)
+
+    def setup_plot(self, status):
+        """Creates the artists of the figure, that are then only updated by
+        draw: redrawing the figure from scratch every day would cost more than
+        simulating it"""
+        from matplotlib.lines import Line2D
+        self.fig.suptitle("Planisuss", fontsize=24)
+        self.ax[0].axis("off")
+        self.ax[1].set_xlabel("Days")
+        self.ax[1].set_ylabel("Number of animals")
+        self.ax[1].set_xlim(0, 100)
+        self.ax[1].set_ylim(0, 100)
+        # the lines of the demographics are not animated, they are part of
+        # the background; the days added are drawn once on it as segments
+        # (see strokes)
+        self.lines = (self.ax[1].plot([], [], 'g')[0],
+                      self.ax[1].plot([], [], 'r')[0])
+        self.segments = (self.ax[1].plot([], [], 'g', animated=True)[0],
+                         self.ax[1].plot([], [], 'r', animated=True)[0])
+        self.new_segments = []
+        self.days = np.arange(1024)  # x of the lines, grown by doubling
+        self.drawn = 0  # days of the history in the lines
+        self.top = 0  # largest population in the lines
+        self.artists = {
+            "map": self.ax[0].imshow(status),
+            # inside the axes, so that it is redrawn with them when blitting
+            "day": self.ax[1].text(0.02, 0.97, "", fontsize=16, va="top",
+                                   transform=self.ax[1].transAxes),
+            "today": self.ax[1].axvline(x=0, c="b", lw=2)}
+        # the legend does not change (the numbers of animals are in the day
+        # text), and has a fixed location, "best" would look at all the points
+        checkpoint = Line2D([], [], c="y", lw=1, ls="--")
+        self.ax[1].legend([*self.lines, self.artists["today"], checkpoint],
+                          ["Erbasts", "Carvizes", "TODAY", "Checkpoint"],
+                          loc="upper right")
+        self.checkpoints = {}  # line of each checkpoint shown, by day
+        self.track_lines = {}  # path of each tracked group shown, by gid
+
+    def animated(self):
+        """The artists that change from one day to the other, the only ones
+        drawn again by the animation when blitting"""
+        if not self.artists:
+            return []
+        return list(self.artists.values()) + \
+            list(self.checkpoints.values()) + list(self.track_lines.values())
+
+    def strokes(self):
+        """The segments of the demographics added since the last call, to be
+        drawn only once on the background of the animation"""
+        strokes, self.new_segments = self.new_segments, []
+        return strokes
+
+    def draw_counts(self, counts):
+        """Puts the days in counts in the lines of the demographics. Only the
+        days added since the last time are looked at, unless the history got
+        shorter (e.g. going back to a checkpoint)"""
+        n = len(counts)
+        if n > len(self.days):
+            self.days = np.arange(2*n)
+        start = max(self.drawn-1, 0)
+        for column, (line, segment) in enumerate(zip(self.lines,
+                                                     self.segments)):
+            line.set_data(self.days[:n], counts[:, column])
+            segment.set_data(self.days[start:n], counts[start:, column])
+        if n > self.drawn:
+            self.top = max(self.top, int(counts[self.drawn:].max()))
+            self.new_segments = list(self.segments)
+        else:
+            self.top = int(counts.max()) if n else 0
+            self.fig.canvas.draw_idle()
+        self.drawn = n
+
+    def draw(self, frame, status, num_erbasts, num_carvizes):
+        """Draws the status and the demographics of the day frame"""
+        if not self.artists:
+            self.setup_plot(status)
         # Time in years, months, days format
         ez_time = ""
         if frame >= 365:
@@ -265,64 +573,59 @@ class World:
         if ez_time:
             ez_time += ")"
 
-        if len(self.history) <= frame:
-            if len(ERBASTS) + len(CARVIZES) >= 50000:
-                self.update_animals_indexes()
-            self.day_events(frame)
-
-            water = np.array([[cell.water for cell in row] for row in self.grid])
-            vegetob = np.array([[0 if cell.vegetob is None else cell.vegetob.density/100
-                        for cell in row] for row in self.grid])
-            erbasts = np.array([[0 if cell.herd is None else min(len(cell.herd)/4, 1.0)
-                        for cell in row] for row in self.grid])
-            carvizes = np.array([[0 if cell.pride is None else min(len(cell.pride)/4, 1.0)
-                        for cell in row] for row in self.grid])
-            num_erbasts = self.total_animals("erbasts")
-            num_carvizes = self.total_animals("carvizes")
-
-            status = np.dstack((carvizes+water, erbasts+water, vegetob+water))
-            self.history.append((status, (num_erbasts, num_carvizes)))
-        else:
-            status, (num_erbasts, num_carvizes) = self.history[frame]
-
-
-        self.fig.suptitle(f"Planisuss: Day {frame} {ez_time}", fontsize=24)
-        self.ax[0].clear()
-        self.ax[0].axis("off")
-        self.ax[0].imshow(status)
-
-        self.ax[1].clear()
-        self.ax[1].plot([x[1][0] for x in self.history], 'g',
-                        label=f"Erbasts: {num_erbasts}")
-        self.ax[1].plot([x[1][1] for x in self.history], 'r',
-                        label=f"Carvizes: {num_carvizes}")
-        self.ax[1].axvline(x=frame, c="b", lw=2, label="TODAY")
-        if SAVED:
-            self.ax[1].axvline(x=SAVED[0], c="y", lw=1, ls="--",
-                               label='Checkpoint')
-            for checkpoint in SAVED[1:]:
-                self.ax[1].axvline(x=checkpoint, c="y", lw=1, ls="--")
-        self.ax[1].legend()
-        self.ax[1].set_xlabel("Days")
-        self.ax[1].set_ylabel("Number of animals")
+        self.artists["day"].set_text(f"Day {frame} {ez_time}\nErbasts: \
+{num_erbasts}\nCarvizes: {num_carvizes}")
+        self.artists["map"].set_data(status)
+
+        counts = self.history.counts
+        if len(counts) != self.drawn:
+            self.draw_counts(counts)
+        self.artists["today"].set_xdata([frame, frame])
+        for day in set(self.checkpoints) - set(SAVED):
+            self.checkpoints.pop(day).remove()
+        for day in SAVED:
+            if day not in self.checkpoints:
+                self.checkpoints[day] = self.ax[1].axvline(x=day, c="y", lw=1,
+                                                           ls="--")
+        # the limits only grow, doubling, so that the axes (that are not
+        # animated) are seldom drawn again
+        right = max(self.drawn, frame + 1)
+        if right > self.ax[1].get_xlim()[1] or \
+                self.top > self.ax[1].get_ylim()[1]:
+            self.ax[1].set_xlim(0, max(self.ax[1].get_xlim()[1], 2*right))
+            self.ax[1].set_ylim(0, max(self.ax[1].get_ylim()[1], 2*self.top))
 
         if num_carvizes+num_erbasts == 0 and frame != 0:
+            if self.ahead is not None:
+                # the causes of death are counted by the world of the last
+                # day taken from the process
+                self.ahead.sync()
             self.plot_causes_of_death()
             raise TotalExtinction
 
         # showing the tracked groups
-        for row in self.grid:
-            for cell in row:
-                if cell.herd and cell.herd.tracked:
-                    X = [el[1].x for el in cell.herd.tracked if el[0] <= frame]
-                    Y = [el[1].y for el in cell.herd.tracked if el[0] <= frame]
-                    self.ax[0].plot(Y, X, "go-", markersize=6, lw=3)
-                if cell.pride and cell.pride.tracked:
-                    X = [el[1].x for el in cell.pride.tracked if el[0] <= frame]
-                    Y = [el[1].y for el in cell.pride.tracked if el[0] <= frame]
-                    self.ax[0].plot(Y, X, "ro-", markersize=6, lw=3)
+        groups = self.tracked_groups()
+        for gid in set(self.track_lines) - set(groups):
+            self.track_lines.pop(gid).remove()
+        for gid, group in groups.items():
+            if gid not in self.track_lines:
+                style = "go-" if group.member_attribute == "herd" else "ro-"
+                self.track_lines[gid], = self.ax[0].plot([], [], style,
+                                                         markersize=6, lw=3)
+            X, Y = group.tracked.until(frame)
+            self.track_lines[gid].set_data(Y, X)
+
+    def tracked_groups(self):
+        """The tracked groups that still exist, the others (that died or
+        joined another group) are forgotten"""
+        for gid, group in list(self.tracked.items()):
+            if not len(group) or \
+                    getattr(group.pos, group.member_attribute) is not group:
+                del self.tracked[gid]
+        return self.tracked
 
     def plot_causes_of_death(self):
+        from matplotlib import pyplot as plt
         self.fig.canvas.draw_idle()
         fig, ax = plt.subplots(1, 3, figsize=(15, 7))
         fig.suptitle("(Animal) Life got extinct, here are the causes:",
@@ -345,6 +648,7 @@ class World:
     def show_info(self, cell, frame):
         """Displays a little window with information about the cell, namely all
         the properties of the vegetob, herd and pride in it"""
+        from tkinter import messagebox
         if cell.water:
             return
         info = ""
@@ -366,7 +670,8 @@ class World:
         average lifespan:\t{round(cell.pride.get_lifetime(), 2)}
         avg social attitude:\t{round(cell.pride.get_sa(), 2)}"""
         else:
-            carvizes, erbasts, vegetob = self.history[frame][0][cell.x, cell.y]
+            carvizes, erbasts, vegetob = self.history.status(frame)[cell.x,
+                                                                    cell.y]
             if vegetob != 0:
                 info += f"Vegetob: {round(vegetob*100)}%"
             if erbasts != 0:
@@ -374,39 +679,57 @@ class World:
             if carvizes != 0:
                 info += f"\nPride: {'>=4' if carvizes == 1 else int(carvizes*4)} carvizes"
 
-        tk.messagebox.showinfo(title=f"Cell ({cell.x}, {cell.y})", message=info)
-
-    def run(self, days=1000):
+        messagebox.showinfo(title=f"Cell ({cell.x}, {cell.y})", message=info)
+
+    def run(self, days=1000, ahead=0, keyframes=0):
+        """Animates the world for at most days days. If ahead is given, up to
+        ahead days are simulated in advance by another process (see
+        Objects.Ahead). If keyframes is given, the state of the world is kept
+        every keyframes days, so that the changes made to a past day are made
+        to the world as it was then (see Objects.Rewind)"""
+        from Visualization import Interactive_Animation
+        if keyframes:
+            from Objects.Rewind import Rewind
+            self.rewind = Rewind(self, keyframes)
+        if ahead:
+            from Objects.Ahead import Ahead
+            self.ahead = Ahead(self, ahead)
         ani = Interactive_Animation(self.fig, self.ax, self.day, mini=0,
-                                    maxi=days,
-                                    cache_frame_data=False, interval=10)
+                                    maxi=days, artists=self.animated,
+                                    strokes=self.strokes, blit=True, cache_frame_data=False,
+                                    interval=10)
         return ani
 
+    def group_cells(self, animals, store, attribute):
+        """Returns the flat index of the cell of each group of the alive
+        animals, by gid (see AnimalStore.per_cell), reading the group from
+        one of its members"""
+        alive = np.flatnonzero(store.alive[:store.size] &
+                               (store.group[:store.size] >= 0))
+        _, first = np.unique(store.group[alive], return_index=True)
+        cells = {}
+        for i in alive[first]:
+            group = getattr(animals[i], attribute)
+            if group is not None:
+                cells[group.gid] = group.pos.x*self.num_cells + group.pos.y
+        return cells
+
     def total_animals(self, flag=None):
         """flag can be None, "erbasts" or "carvizes" and returns respectively
         the total number of animals in the world, the total number of erbasts
-        and the total number of carvizes"""
+        and the total number of carvizes. Read from the counters of the
+        stores"""
         res = 0
-        for row in self.grid:
-            for cell in row:
-                if cell.herd and flag in [None, "erbasts"]:
-                    if len(cell.herd):
-                        res += len(cell.herd)
-                    else:
-                        cell.remove_herd()
-                if cell.pride and flag in [None, "carvizes"]:
-                    if len(cell.pride):
-                        res += len(cell.pride)
-                    else:
-                        cell.remove_pride()
+        if flag in [None, "erbasts"]:
+            res += ERBAST_STORE.population
+        if flag in [None, "carvizes"]:
+            res += CARVIZ_STORE.population
         return res
 
     def total_energy(self, flag=None):
         res = 0
-        for row in self.grid:
-            for cell in row:
-                if cell.herd and flag in [None, 'erbasts']:
-                    res += cell.herd.get_energy()
-                if cell.pride and flag in [None, 'carvizes']:
-                    res += cell.pride.get_energy()
-        return res
+        if flag in [None, "erbasts"]:
+            res += ERBAST_STORE.total_energy
+        if flag in [None, "carvizes"]:
+            res += CARVIZ_STORE.total_energy
+        return float(res)
@@ -6,7 +6,10 @@ import numpy as np
 class Interactive_Animation(FuncAnimation):
     def __init__(self, fig, ax, func, frames=None, init_func=None, fargs=None,
                  save_count=None, mini=0, maxi=100, pos=(0.125, 0.835),
-                 interval=500, **kwargs):
+                 interval=500, artists=None, strokes=None, **kwargs):
+        """artists returns the artists changed by func, that are the only ones
+        drawn at each frame when blit is True; strokes returns the artists to
+        be drawn only once, on the background kept for blitting"""
         self.pressed = []
         self.i = 0
         self.min=mini
@@ -17,9 +20,11 @@ class Interactive_Animation(FuncAnimation):
         self.ax = ax
         self.tracked = np.array([[]])
         self.func = func
+        self.artists = artists or list
+        self.strokes = strokes or list
         self.setup(pos)
         self._original_interval = interval
-        FuncAnimation.__init__(self,self.fig, self.func, frames=self.play(),
+        FuncAnimation.__init__(self,self.fig, self.update, frames=self.play(),
                                            init_func=init_func, fargs=fargs,
                                            save_count=save_count,
                                interval=interval, **kwargs )
@@ -33,6 +38,43 @@ class Interactive_Animation(FuncAnimation):
                 self.stop()
                 yield self.i
 
+    def update(self, i):
+        limits = [(ax.get_xlim(), ax.get_ylim()) for ax in self.ax]
+        self.func(i)
+        strokes = self.strokes()
+        if not self._blit:
+            return
+        if limits != [(ax.get_xlim(), ax.get_ylim()) for ax in self.ax]:
+            # the axes have to be drawn again, and a new background saved
+            self.fig.canvas.draw()
+        else:
+            self.paint(strokes)
+        return self.artists()
+
+    def paint(self, artists):
+        """Draws the artists on the backgrounds saved for blitting, where they
+        stay without being drawn again at every frame"""
+        canvas = self.fig.canvas
+        for artist in artists:
+            if artist.axes in self._blit_cache:
+                artist.axes.draw_artist(artist)
+        for ax in {artist.axes for artist in artists} & set(self._blit_cache):
+            self._blit_cache[ax] = (ax._get_view(),
+                                    canvas.copy_from_bbox(ax.bbox))
+
+    def on_draw(self, event):
+        """A full draw of the figure (e.g. after a click) leaves out the
+        animated artists: the backgrounds used for blitting are saved again,
+        and the artists are drawn on top of them"""
+        if not getattr(self, "_blit", False):
+            return
+        canvas = self.fig.canvas
+        self._blit_cache = {ax: (ax._get_view(), canvas.copy_from_bbox(ax.bbox))
+                            for ax in self.ax}
+        for artist in self.artists():
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+
     def start(self):
         self.runs=True
         self.event_source.start()
@@ -113,6 +155,12 @@ class Interactive_Animation(FuncAnimation):
         elif event.key == 'enter':
             self.func(self.i, save=True)
             self.fig.canvas.draw_idle()
+        elif event.key == 'z':
+            self.func(self.i, rewind=True)
+            self.fig.canvas.draw_idle()
+        elif event.key == 't' and event.inaxes == self.ax[0]:
+            self.func(self.i, track=(round(event.ydata), round(event.xdata)))
+            self.fig.canvas.draw_idle()
 
 
     def setup(self, pos):
@@ -139,5 +187,6 @@ class Interactive_Animation(FuncAnimation):
         conn_space = self.fig.canvas.mpl_connect("key_press_event", self.on_keypress)
         conn_release = self.fig.canvas.mpl_connect("button_release_event", self.on_release)
         conn_move = self.fig.canvas.mpl_connect("motion_notify_event", self.on_move)
+        conn_draw = self.fig.canvas.mpl_connect("draw_event", self.on_draw)
 
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+import variables
+from Objects import Checkpoint
+from Objects.World import World
+
+METRICS = ("Euclidean", "Manhattan", "Chebyshev")
+desc = 'Times the hot paths of Planisuss on worlds of different sizes and \
+population densities, with fixed seeds, and prints the results as JSON.'
+
+
+def make_world(num_cells, density, seed, neighborhood=1):
+    """Creates a headless world with the given seed. The density is the number
+    of times herds and prides are spawned on the land (1 is the default
+    world). Returns the world and the seconds taken by its creation"""
+    variables.reset()
+    variables.DISTANCE = "Euclidean"
+    np.random.seed(seed)
+    start = perf_counter()
+    world = World(num_cells, neighborhood, headless=True)
+    seconds = perf_counter() - start
+    for _ in range(density - 1):
+        for cell in world.grid.flat:
+            if not cell.water:
+                cell.add_herd(None, world)
+                cell.add_pride(None, world)
+    return world, seconds
+
+
+def timed(function, *args):
+    start = perf_counter()
+    function(*args)
+    return perf_counter() - start
+
+
+def bench_day(world, state, seed):
+    Checkpoint.restore(world, state)
+    np.random.seed(seed)
+    return timed(world.day_events, len(world.history)), 1
+
+
+def bench_neighbors(world, state, seed, metric, near):
+    """Calls get_neighbors on random land cells, with only land cells as
+    the prides do"""
+    variables.DISTANCE = metric
+    rng = np.random.RandomState(seed)
+    land = np.argwhere(~world.water)
+    cells = [world.grid[x, y] for x, y in land[rng.randint(len(land),
+                                                           size=10000)]]
+    start = perf_counter()
+    for cell in cells:
+        world.get_neighbors(cell, near, flag="land")
+    seconds = perf_counter() - start
+    variables.DISTANCE = "Euclidean"
+    return seconds, len(cells)
+
+
+def bench_fight(world, state, seed):
+    """Makes the prides fight two by two"""
+    Checkpoint.restore(world, state)
+    np.random.seed(seed)
+    prides = [cell.pride for cell in world.grid.flat if cell.pride and
+              len(cell.pride)][:400]
+    pairs = list(zip(prides[::2], prides[1::2]))
+    for _, other in pairs:
+        other.pos.pride = None
+    start = perf_counter()
+    for pride, other in pairs:
+        pride.fight(other)
+    return perf_counter() - start, len(pairs)
+
+
+def bench_hunt(world, state, seed):
+    """Makes every pride sharing its cell with a herd hunt it"""
+    Checkpoint.restore(world, state)
+    np.random.seed(seed)
+    prides = [cell.pride for cell in world.grid.flat if cell.pride and
+              len(cell.pride) and cell.herd and len(cell.herd)][:200]
+    start = perf_counter()
+    for pride in prides:
+        if len(pride.pos.herd):
+            pride.hunt()
+    return perf_counter() - start, len(prides)
+
+
+def bench_compact(world, state, seed):
+    """Compaction after one day, when the rows of the dead animals are free
+    (it replaced the renumbering of World.update_animals_indexes)"""
+    Checkpoint.restore(world, state)
+    np.random.seed(seed)
+    world.day_events(len(world.history))
+    variables.ERBAST_STORE.recycle()
+    variables.CARVIZ_STORE.recycle()
+    return timed(world.compact), 1
+
+
+def bench_save(world, state, seed, path):
+    Checkpoint.restore(world, state)
+    return timed(Checkpoint.save, path, world), 1
+
+
+def bench_load(world, state, seed, path):
+    return timed(Checkpoint.load, path, world), 1
+
+
+def run(sizes, densities, repeats, seed):
+    """Runs every benchmark repeats times for each size and density, always
+    starting from the same state. Returns a list of results, each with the
+    seconds of every repetition and the number of calls timed in each"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "checkpoint.npz")
+        for num_cells in sizes:
+            for density in densities:
+                world, seconds = make_world(num_cells, density, seed)
+                config = {"num_cells": num_cells, "density": density,
+                          "erbasts": variables.ERBAST_STORE.population,
+                          "carvizes": variables.CARVIZ_STORE.population}
+                # a single world is created for each size and density
+                results.append({**config, "benchmark": "start_life",
+                                "seconds": [seconds], "calls": 1,
+                                "min": seconds, "median": seconds})
+                state = Checkpoint.state(world)
+                benchmarks = [("day_events", bench_day, ()),
+                              ("fight", bench_fight, ()),
+                              ("hunt", bench_hunt, ()),
+                              ("compact", bench_compact, ()),
+                              ("checkpoint_save", bench_save, (path,)),
+                              ("checkpoint_load", bench_load, (path,))]
+                for metric in METRICS:
+                    for near in (1, max(1, num_cells//10)):
+                        benchmarks.append((f"get_neighbors_{metric}_{near}",
+                                           bench_neighbors, (metric, near)))
+                for name, function, args in benchmarks:
+                    times = []
+                    for repeat in range(repeats):
+                        seconds, calls = function(world, state, seed + repeat,
+                                                  *args)
+                        times.append(seconds)
+                    results.append({**config, "benchmark": name,
+                                    "seconds": times, "calls": calls,
+                                    "min": min(times),
+                                    "median": float(np.median(times))})
+    return results
+
+
+def machine():
+    """Description of the machine and of the code, to compare results"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))
+                                ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": sys.version.split()[0], "numpy": np.__version__,
+            "platform": platform.platform(), "processor": platform.processor(),
+            "commit": commit}
+
+
+def argument_parser():
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument('-n', '--sizes', type=int, nargs='+',
+                        default=[50, 200, 1000],
+                        help='The numbers of cells of the worlds.')
+    parser.add_argument('-D', '--densities', type=int, nargs='+',
+                        default=[1, 2, 4],
+                        help='How many times the animals are spawned on the \
+land of each world.')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+                        help='The number of repetitions of each benchmark.')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='The seed of the worlds.')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="File .json where to write the results, by \
+default they are printed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = argument_parser()
+    report = {"machine": machine(), "seed": args.seed,
+              "repeats": args.repeats,
+              "results": run(args.sizes, args.densities, args.repeats,
+                             args.seed)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
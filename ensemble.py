@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+import argparse
+import os
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import variables
+from Objects.Simulation import Simulation
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+desc = 'Runs the same configuration of Planisuss under many seeds in \
+parallel, without graphical interface, and summarizes the demographics.'
+
+
+def simulate_counts(seed, num_cells, neighborhood, days, distance,
+                    parameters=None, counts=None):
+    """Runs a headless simulation with the given seed (and behavioral
+    parameters, see variables.PARAMETERS) and returns the (days+1, 2) array of
+    the number of erbasts and carvizes of each day. If counts is given, the
+    populations are written there"""
+    if counts is None:
+        counts = np.zeros((days+1, 2), dtype=np.int64)
+    # the worker processes are reused, so the state of the previous run must
+    # be forgotten
+    variables.reset()
+    variables.DISTANCE = distance
+    for name, value in (parameters or {}).items():
+        variables.set_parameter(name, value)
+    np.random.seed(seed)
+    # only the number of animals is needed, the images are not built
+    simulation = Simulation(num_cells, neighborhood, images=False)
+    world = simulation.world
+    counts[0] = (world.total_animals("erbasts"),
+                 world.total_animals("carvizes"))
+    for stats in simulation.run(days):
+        counts[stats["day"]] = (stats["erbasts"], stats["carvizes"])
+    return counts
+
+
+def run_seed(job):
+    """Runs the simulation of one seed, writing the populations in its row of
+    the shared array. Returns the index of the row"""
+    index, seed, num_cells, neighborhood, days, distance, shm_name, \
+        shape = job
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        counts = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)[index]
+        simulate_counts(seed, num_cells, neighborhood, days, distance,
+                        counts=counts)
+        return index
+    finally:
+        shm.close()
+
+
+def summarize(counts, quantiles=QUANTILES):
+    """Given the (seeds, days+1, 2) array of the populations of erbasts and
+    carvizes, returns their mean and quantiles over the seeds for each day and
+    the day of extinction of each species for each seed (-1 if it survived)"""
+    extinct = counts[:, 1:, :] == 0
+    extinction = np.where(extinct.any(axis=1), extinct.argmax(axis=1) + 1, -1)
+    return {"counts": counts,
+            "mean": counts.mean(axis=0),
+            "quantiles": dict(zip(quantiles,
+                                  np.quantile(counts, quantiles, axis=0))),
+            "extinction": extinction}
+
+
+def run_ensemble(seeds, num_cells=variables.NUM_CELLS,
+                 neighborhood=variables.NEIGHBORHOOD, days=variables.DAYS,
+                 distance=variables.DISTANCE, processes=None):
+    """Runs one simulation for each seed spreading them on a pool of
+    processes (one per core by default), and returns the summary of the
+    populations (see summarize). The workers write directly in an array in
+    shared memory, so only the indexes travel back to this process"""
+    seeds = list(seeds)
+    shape = (len(seeds), days+1, 2)
+    shm = shared_memory.SharedMemory(create=True,
+                                     size=max(1, int(np.prod(shape))*8))
+    try:
+        counts = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+        counts[:] = 0
+        jobs = [(i, seed, num_cells, neighborhood, days, distance, shm.name,
+                 shape) for i, seed in enumerate(seeds)]
+        with Pool(processes or os.cpu_count()) as pool:
+            for _ in pool.imap_unordered(run_seed, jobs):
+                pass
+        summary = summarize(counts.copy())
+    finally:
+        shm.close()
+        shm.unlink()
+    summary["seeds"] = seeds
+    return summary
+
+
+def argument_parser():
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument('-s', '--seeds', type=int, default=os.cpu_count(),
+                        help='The number of seeds (simulations) to run.')
+    parser.add_argument('--first-seed', type=int, default=0,
+                        help='The first seed, the others follow in order.')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='The number of worker processes, by default one \
+per core.')
+    parser.add_argument('-n', '--num_cells', type=int,
+                        default=variables.NUM_CELLS,
+                        help='The number of cells in the world.')
+    parser.add_argument('-d', '--days', type=int, default=1000,
+                        help='The number of days to run each simulation.')
+    parser.add_argument('-b', '--neighborhood', type=int,
+                        default=variables.NEIGHBORHOOD,
+                        help='The number of cells that are considered to be \
+nearby, hence visible by Erbasts')
+    parser.add_argument('-m', '--distance', type=str,
+                        default=variables.DISTANCE,
+                        help="The metric to be used")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="File .npz where to save the populations of \
+each seed and day, and the summary")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = argument_parser()
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    summary = run_ensemble(seeds, args.num_cells, args.neighborhood,
+                           args.days, args.distance, args.processes)
+    for i, species in enumerate(("Erbasts", "Carvizes")):
+        final = summary["counts"][:, -1, i]
+        extinction = summary["extinction"][:, i]
+        print(f"{species}:")
+        print(f"    mean population on day {args.days}:\t{final.mean():.2f}")
+        for q, values in summary["quantiles"].items():
+            print(f"    quantile {q}:\t\t\t{values[-1, i]:.2f}")
+        print(f"    extinct in {(extinction >= 0).sum()}/{len(extinction)} \
+runs, days: {sorted(extinction[extinction >= 0].tolist())}")
+    if args.output:
+        np.savez_compressed(args.output, seeds=np.array(summary["seeds"]),
+                            counts=summary["counts"], mean=summary["mean"],
+                            quantiles=np.array(list(summary["quantiles"].values())),
+                            extinction=summary["extinction"])
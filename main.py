@@ -1,12 +1,31 @@
 #!/usr/bin/env python
-import sys
-from matplotlib import pyplot as plt
+import atexit
 from Objects import World
+from Objects.Simulation import Simulation
+from Objects.Telemetry import CsvTelemetry
+from Objects.Profiler import PROFILER
+import variables
 from variables import argument_parser
 
 if __name__ == "__main__":
-    sys.setrecursionlimit(10000)
-    num_cells, neighborhood, days = argument_parser()
-    world = World.World(num_cells, neighborhood)
-    anim = world.run(days)
-    plt.show()
+    num_cells, neighborhood, days, headless = argument_parser()
+    if variables.PROFILE:
+        PROFILER.enable()
+        atexit.register(PROFILER.save, variables.PROFILE)
+    if headless:
+        simulation = Simulation(num_cells, neighborhood,
+                                tiles=variables.TILES,
+                                processes=variables.PROCESSES,
+                                checkpoint_every=variables.CHECKPOINT_EVERY)
+        if variables.TELEMETRY:
+            simulation.world.sinks.append(CsvTelemetry(variables.TELEMETRY))
+        for stats in simulation.run(days):
+            print(f"{stats['day']}, {stats['erbasts']}, {stats['carvizes']}")
+    else:
+        from matplotlib import pyplot as plt
+        world = World.World(num_cells, neighborhood)
+        if variables.TELEMETRY:
+            world.sinks.append(CsvTelemetry(variables.TELEMETRY))
+        anim = world.run(days, ahead=variables.AHEAD,
+                         keyframes=variables.KEYFRAMES)
+        plt.show()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from glob import glob
+from multiprocessing import Pool
+import numpy as np
+import variables
+from ensemble import simulate_counts
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE = os.path.join(ROOT, "sweeps")
+desc = 'Runs Planisuss on a grid of behavioral parameters and seeds, without \
+graphical interface, caching every result on disk.'
+
+
+def code_version():
+    """Hash of the source code of the simulation, so that cached results are
+    not reused after the rules of the ecosystem change"""
+    digest = hashlib.sha256()
+    for path in sorted(glob(os.path.join(ROOT, "Objects", "*.py")) +
+                       [os.path.join(ROOT, name) for name in
+                        ("variables.py", "errors.py", "ensemble.py")]):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def point_key(parameters, seed, config, version):
+    """Name of the cache file of one point of the sweep"""
+    point = {"parameters": parameters, "seed": seed, "config": config,
+             "version": version}
+    return hashlib.sha256(json.dumps(point, sort_keys=True).encode()
+                          ).hexdigest()
+
+
+def run_point(job):
+    """Simulates one point of the sweep and saves it in the cache. The file is
+    renamed only once complete, so an interrupted sweep leaves no partial
+    results"""
+    path, parameters, seed, config = job
+    counts = simulate_counts(seed, config["num_cells"], config["neighborhood"],
+                             config["days"], config["distance"], parameters)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, counts=counts, parameters=json.dumps(parameters),
+             seed=seed)
+    os.replace(tmp, path)
+    return path
+
+
+def sweep(grid, seeds, num_cells=variables.NUM_CELLS,
+          neighborhood=variables.NEIGHBORHOOD, days=1000,
+          distance=variables.DISTANCE, processes=None, cache=CACHE):
+    """Runs the simulation for every combination of the values in grid (a
+    dictionary from parameter names to lists of values, see
+    variables.PARAMETERS) and every seed. Points already in the cache are not
+    simulated again. Returns a list of (parameters, seed, counts) where counts
+    is the (days+1, 2) array of the populations of erbasts and carvizes"""
+    for name in grid:
+        if name not in variables.PARAMETERS:
+            raise KeyError(f"Unknown parameter {name}")
+    os.makedirs(cache, exist_ok=True)
+    config = {"num_cells": num_cells, "neighborhood": neighborhood,
+              "days": days, "distance": distance}
+    version = code_version()
+    points = []
+    for values in itertools.product(*grid.values()):
+        # every parameter is set explicitly, since workers are reused
+        parameters = dict(variables.PARAMETERS)
+        parameters.update(zip(grid, values))
+        for seed in seeds:
+            path = os.path.join(cache, point_key(parameters, seed, config,
+                                                 version) + ".npz")
+            points.append((path, parameters, seed, config))
+    missing = [point for point in points if not os.path.exists(point[0])]
+    if missing:
+        with Pool(processes or os.cpu_count()) as pool:
+            for _ in pool.imap_unordered(run_point, missing):
+                pass
+    results = []
+    for path, parameters, seed, _ in points:
+        with np.load(path) as data:
+            results.append((parameters, seed, data["counts"]))
+    return results
+
+
+def parse_grid(options):
+    """Parses a list of NAME=VALUE1,VALUE2,... into a dictionary, converting
+    the values to the type of the default of each parameter"""
+    grid = {}
+    for option in options:
+        name, values = option.split("=", 1)
+        kind = type(variables.PARAMETERS[name])
+        grid[name] = [kind(float(value)) for value in values.split(",")]
+    return grid
+
+
+def argument_parser():
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument('-p', '--parameter', action='append', default=[],
+                        metavar='NAME=VALUE1,VALUE2,...',
+                        help=f"Values of one of the behavioral constants, can \
+be repeated. Possible names: {', '.join(variables.PARAMETERS)}")
+    parser.add_argument('-s', '--seeds', type=int, default=4,
+                        help='The number of seeds for each point.')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='The number of worker processes, by default one \
+per core.')
+    parser.add_argument('-n', '--num_cells', type=int,
+                        default=variables.NUM_CELLS,
+                        help='The number of cells in the world.')
+    parser.add_argument('-d', '--days', type=int, default=1000,
+                        help='The number of days to run each simulation.')
+    parser.add_argument('-b', '--neighborhood', type=int,
+                        default=variables.NEIGHBORHOOD,
+                        help='The number of cells that are considered to be \
+nearby, hence visible by Erbasts')
+    parser.add_argument('-m', '--distance', type=str,
+                        default=variables.DISTANCE,
+                        help="The metric to be used")
+    parser.add_argument('-c', '--cache', type=str, default=CACHE,
+                        help="Directory of the cached results")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = argument_parser()
+    grid = parse_grid(args.parameter)
+    results = sweep(grid, range(args.seeds), args.num_cells,
+                    args.neighborhood, args.days, args.distance,
+                    args.processes, args.cache)
+    print(", ".join(list(grid) + ["seed", "erbasts", "carvizes"]))
+    for parameters, seed, counts in results:
+        row = [parameters[name] for name in grid] + [seed, *counts[-1]]
+        print(", ".join(str(value) for value in row))
@@ -1,19 +1,67 @@
 import argparse
+from Objects.Store import AnimalStore
 CARVIZES = []
 ERBASTS = []
+# columns of the attributes of the animals, indexed by id as the lists above
+CARVIZ_STORE = AnimalStore()
+ERBAST_STORE = AnimalStore()
 
 DAYS = 10000
 
 NUM_CELLS = 50
 NEIGHBORHOOD = 1
 DISTANCE = "Euclidean"
+HEADLESS = False
+TILES = 0  # tiles per side of the parallel movement phase, 0 to disable it
+PROCESSES = None
+AHEAD = 16  # days simulated in advance in the GUI, 0 to disable it
+KEYFRAMES = 50  # days between the states kept to rewind in the GUI (at most 20), 0 for none
+CHECKPOINT_EVERY = 0  # days between checkpoints in headless mode, 0 for none
+TELEMETRY = None  # csv file where the statistics of each day are appended
+PROFILE = None  # csv file where the timings of each day are written at exit
+# bytes of memory over which the dead animals are forgotten, see World.compact
+MEMORY_BUDGET = None
 CAUSE_OF_DEATH = {"Erbast": {},
                   "Carviz": {}}
+# behavioral constants of the ecosystem, can be changed from the command line
+# with -p NAME=VALUE
+PARAMETERS = {"erbast_energy": 100,   # energy of spawned erbasts
+              "erbast_lifetime": 10,
+              "erbast_social_attitude": 0.8,
+              "carviz_energy": 1000,  # energy of spawned carvizes
+              "carviz_lifetime": 1,
+              "carviz_social_attitude": 0.8,
+              "carviz_stay": 0.5,  # probability of a carviz to follow its pride
+              "vegetob_min_density": 1,  # density of regrowth from nothing
+              "vegetob_growth": 100000}  # the bigger, the slower it grows
+
+def reset():
+    """Forgets all the animals and the causes of death, so that a new
+    simulation can be started in the same process"""
+    CARVIZES.clear()
+    ERBASTS.clear()
+    CARVIZ_STORE.clear()
+    ERBAST_STORE.clear()
+    for causes in CAUSE_OF_DEATH.values():
+        causes.clear()
+
+
+def set_parameter(name, value):
+    """Sets the behavioral constant name, converting value to the type of its
+    default"""
+    if name not in PARAMETERS:
+        raise KeyError(f"Unknown parameter {name}, possible parameters are \
+{', '.join(PARAMETERS)}")
+    PARAMETERS[name] = type(PARAMETERS[name])(float(value))
+
+
 desc = 'Simulation of a three-species ecosystem: Vegetobs, Erbasts and \
 Carvizes; which are respectevely plants, herbivores and carnivores.'
 
 def argument_parser():
-    global NUM_CELLS, NEIGHBORHOOD, DAYS, DISTANCE
+    global NUM_CELLS, NEIGHBORHOOD, DAYS, DISTANCE, HEADLESS, TILES, \
+        PROCESSES, AHEAD, KEYFRAMES, CHECKPOINT_EVERY, TELEMETRY, PROFILE, \
+        MEMORY_BUDGET
     parser = argparse.ArgumentParser(description=desc)
     parser.add_argument('-n', '--num_cells', type=int, default=NUM_CELLS,
                         help='The number of cells in the world.')
@@ -24,9 +72,60 @@ def argument_parser():
 nearby, hence visible by Erbasts')
     parser.add_argument('-m', '--distance', type=str, default=DISTANCE,
                         help="The metric to be used")
+    parser.add_argument('-p', '--parameter', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help=f"Changes one of the behavioral constants, can \
+be repeated. Possible names: {', '.join(PARAMETERS)}")
+    parser.add_argument('--headless', action='store_true',
+                        help="Runs the simulation without any graphical \
+interface, printing the population of each day")
+    parser.add_argument('-t', '--tiles', type=int, default=TILES,
+                        help="Splits the movement phase in tiles x tiles \
+tiles simulated in parallel, only with --headless")
+    parser.add_argument('-j', '--processes', type=int, default=PROCESSES,
+                        help="The number of processes used with --tiles, by \
+default one per core")
+    parser.add_argument('-a', '--ahead', type=int, default=AHEAD,
+                        help="The number of days simulated in advance by \
+another process while the previous ones are shown, 0 to simulate each day \
+only when it is shown")
+    parser.add_argument('--keyframes', type=int, default=KEYFRAMES,
+                        metavar='K',
+                        help="Keeps the state of the world every K days, so \
+that the changes made to a past day are made to the world as it was then and \
+the following days are simulated again, 0 to disable it")
+    parser.add_argument('-k', '--checkpoint-every', type=int,
+                        default=CHECKPOINT_EVERY,
+                        help="Saves a checkpoint in background every this \
+many days, only with --headless")
+    parser.add_argument('--telemetry', type=str, default=TELEMETRY,
+                        metavar='FILE',
+                        help="Appends the statistics of each day (populations, \
+energy, vegetation, births and deaths by cause) to the csv file FILE")
+    parser.add_argument('--profile', type=str, default=PROFILE,
+                        metavar='FILE',
+                        help="Measures the time of each phase of the day and \
+counts the calls of the hot functions, writing one row per day in the csv \
+file FILE at exit")
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        metavar='MB',
+                        help="Forgets the dead animals and shrinks the arrays \
+when the memory used by the simulation exceeds MB megabytes")
     args = parser.parse_args()
     NUM_CELLS = args.num_cells
     DAYS = args.days
     NEIGHBORHOOD = args.neighborhood
     DISTANCE = args.distance
-    return NUM_CELLS, NEIGHBORHOOD, DAYS
+    HEADLESS = args.headless
+    TILES = args.tiles
+    PROCESSES = args.processes
+    AHEAD = args.ahead
+    KEYFRAMES = args.keyframes
+    CHECKPOINT_EVERY = args.checkpoint_every
+    TELEMETRY = args.telemetry
+    PROFILE = args.profile
+    if args.memory_budget:
+        MEMORY_BUDGET = int(args.memory_budget * 2**20)
+    for parameter in args.parameter:
+        set_parameter(*parameter.split("=", 1))
+    return NUM_CELLS, NEIGHBORHOOD, DAYS, HEADLESS